@@ -1,7 +1,13 @@
 import pandas as pd
 import streamlit as st
 
+import debug_panel
+from estimate_export import XLSX_MIME, write_csv, write_xlsx
+from price_index import file_hash, get_price_index, normalize_size
+from profiling import span
+
 st.set_page_config(page_title="Price Extractor - Fits Engineering", page_icon="📦")
+run = debug_panel.begin("Fits_8M_NUT_price")
 
 # 🏢 Company Title
 st.title("📦 Fits Engineering Products Pvt Ltd, Coimbatore")
@@ -11,18 +17,19 @@ st.subheader("Price Extractor")
 uploaded_file = st.file_uploader("Upload your pricing sheet", type=["xlsx", "xls"])
 
 if uploaded_file:
-    # Read Excel & Normalize Column Names
-    df = pd.read_excel(uploaded_file)
-    df.columns = df.columns.str.strip().str.lower()
+    # Index every sheet once per file; re-uploads of the same file reuse it.
+    # Only size, length, MOQ and price are kept, streamed from the workbook.
+    # The upload is hashed once; reruns (every keystroke) reuse the hash kept per file_id
+    if st.session_state.get("price_file_id") != uploaded_file.file_id:
+        st.session_state.price_file_id = uploaded_file.file_id
+        st.session_state.price_file_hash = file_hash(uploaded_file.getvalue())
+    index = get_price_index(uploaded_file.getvalue(), st.session_state.price_file_hash)
 
     # 🔍 Enter Spec Size
-    spec_input = st.text_input("Enter the Size (e.g., 8M NUT)").strip().lower()
-
-    # Clean the 'size' column
-    df['size'] = df['size'].astype(str).str.strip().str.lower()
+    spec_input = normalize_size(st.text_input("Enter the Size (e.g., 8M NUT)"))
 
     if spec_input:
-        matched_rows = df[df['size'] == spec_input]
+        matched_rows = index.rows(spec_input).fillna("N/A")
 
         if not matched_rows.empty:
             row = matched_rows.iloc[0]
@@ -41,5 +48,43 @@ if uploaded_file:
             st.write(f"**📏 Length:** {length} inch")
             st.write(f"**📦 MOQ:** {moq}")
             st.write(f"**💰 Final Price:** ₹{price}")
+            if len(matched_rows) > 1:
+                st.caption(f"{len(matched_rows)} rows share this size:")
+                st.dataframe(matched_rows)
         else:
             st.error("❌ Spec not found. Please check the spelling or try another input.")
+            suggestions = index.fuzzy(spec_input) or index.prefix(spec_input)
+            if suggestions:
+                st.info("Did you mean: " + ", ".join(f"`{s}`" for s in suggestions))
+
+    # 📋 Bulk Lookup for RFQs
+    st.subheader("📋 Bulk Lookup")
+    pasted = st.text_area("Paste sizes (one per line)")
+    rfq_file = st.file_uploader("...or upload an RFQ CSV (uses the 'size' column, else the first column)", type=["csv"])
+
+    specs = [line for line in pasted.splitlines() if line.strip()]
+    if rfq_file:
+        with span("read RFQ"):
+            rfq_df = pd.read_csv(rfq_file, dtype=str)
+        rfq_df.columns = rfq_df.columns.str.strip().str.lower()
+        column = "size" if "size" in rfq_df.columns else rfq_df.columns[0]
+        specs += rfq_df[column].dropna().tolist()
+
+    if specs:
+        results = index.lookup_many(specs)
+        missing = results.loc[~results["found"], "spec"].tolist()
+        st.write(f"**{len(specs)} specs → {int(results['found'].sum())} matching rows, {len(missing)} not found**")
+        st.dataframe(results)
+
+        # Blank cells rather than NaN for misses
+        records = results.astype(object).where(results.notna(), None).to_dict("records")
+        col1, col2 = st.columns(2)
+        with span("write bulk lookup"):
+            xlsx_data = write_xlsx(records, list(results.columns))
+            csv_data = write_csv(records, list(results.columns))
+        col1.download_button("📥 Download Excel", data=xlsx_data,
+                             file_name="Fits_bulk_lookup.xlsx", mime=XLSX_MIME)
+        col2.download_button("📥 Download CSV", data=csv_data,
+                             file_name="Fits_bulk_lookup.csv", mime="text/csv")
+
+debug_panel.show(run)
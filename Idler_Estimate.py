@@ -1,46 +1,95 @@
 import streamlit as st
 import pandas as pd
-import math
 from io import BytesIO
+from datetime import date
+from functools import partial
+import debug_panel
+from estimate_export import EXPORT_FORMATS, export_bytes, parquet_available
+from estimate_store import ColumnStore
+from idler_costing import IDLER_TYPES, cost_idlers, idler_cost_graph
+from idler_master import MASTER_FILE, get_catalogue
+from idler_sweep import catalogue_size_costs, sweep
+from material_prices import add_price, fill_bom_prices, get_price_history
+from profiling import span
 
-# Densities in g/cm³
-MATERIAL_DENSITY = {
-    "Mild Steel": 7.85,
-    "Stainless Steel": 8.0
+# Columns of the estimation list; text columns are stored once per distinct value
+IDLER_COLUMNS = {
+    "Company": "category",
+    "Material": "category",
+    "Idler Type": "category",
+    "Pipe OD": "float",
+    "Pipe Length": "float",
+    "Pipe Weight (kg)": "float",
+    "Shaft Weight (kg)": "float",
+    "Pipe Cost (₹)": "float",
+    "Shaft Cost (₹)": "float",
+    "Bought-out Cost (₹)": "float",
+    "Rubber Ring Cost (₹)": "float",
+    "Rubber Fixing Cost (₹)": "float",
+    "Conversion Cost (₹)": "float",
+    "Overhead (10%) (₹)": "float",
+    "Profit Margin (%)": "int",
+    "Profit Cost (₹)": "float",
+    "Final Cost (₹)": "float",
+    "Idler Label": "category",
+    "RAG Used": "bool"
 }
 
-# Weight Calculations
-def calc_pipe_weight(od, thickness, length, density):
-    outer_radius = od / 2
-    inner_radius = outer_radius - thickness
-    volume_mm3 = math.pi * ((outer_radius**2 - inner_radius**2)) * length
-    volume_cm3 = volume_mm3 / 1000
-    weight_kg = (volume_cm3 * density) / 1000
-    return round(weight_kg, 2)
-
-def calc_shaft_weight(dia, length, density):
-    radius = dia / 2
-    volume_mm3 = math.pi * (radius**2) * length
-    volume_cm3 = volume_mm3 / 1000
-    weight_kg = (volume_cm3 * density) / 1000
-    return round(weight_kg, 2)
-
-# Session state
-if "idler_data" not in st.session_state:
-    st.session_state.idler_data = []
+# Session state (own keys, so it can run next to SFNew_IdlerEst.py in the launcher)
+if "estimate_data" not in st.session_state:
+    st.session_state.estimate_data = ColumnStore(IDLER_COLUMNS)
+    st.session_state.estimate_export_cache = {}
+if "estimate_cost_graph" not in st.session_state:
+    st.session_state.estimate_cost_graph = idler_cost_graph()
 
+run = debug_panel.begin("Idler_Estimate")
 st.title("🔩 STEADFAST Idler/Roller Cost Estimator")
 
-# RAG Placeholder
-use_rag = st.checkbox("🔍 Use RAG to auto-fetch weights/prices (placeholder only)")
+# RAG lookup against the shared master catalogue
+use_rag = st.checkbox("🔍 Use RAG to auto-fetch component prices from the master catalogue")
+
+# Batch mode
+st.subheader("📑 Batch BOM Costing")
+bom_file = st.file_uploader("Upload BOM Excel (one idler per row)", type=["xlsx"])
+if bom_file:
+    try:
+        with span("read BOM"):
+            bom_df = pd.read_excel(bom_file)
+        # Blank price cells priced as of each row's Quote Date
+        costed_df, rejected = cost_idlers(fill_bom_prices(bom_df), get_price_history().densities())
+    except ValueError as e:
+        st.error(f"❌ {e}")
+    else:
+        if not rejected.empty:
+            st.warning(f"{len(rejected)} rows skipped:")
+            st.dataframe(rejected)
+        st.dataframe(costed_df)
+        st.write(f"**Total for {len(costed_df)} idlers:** ₹{round(costed_df['Final Cost'].sum(), 2)}")
+        bom_buffer = BytesIO()
+        with span("write costed BOM"), pd.ExcelWriter(bom_buffer, engine='openpyxl') as writer:
+            costed_df.to_excel(writer, index=False)
+        st.download_button(
+            label="📥 Download Costed BOM",
+            data=bom_buffer.getvalue(),
+            file_name="STEADFAST_bom_costing.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
 
 # Inputs
 st.subheader("🧱 Material Selection")
-material_type = st.selectbox("Select Material", ["Mild Steel", "Stainless Steel"])
-density = MATERIAL_DENSITY[material_type]
+# Prices and density in effect on the quote date (requote old estimates by changing it)
+price_history = get_price_history()
+material_type = st.selectbox("Select Material", price_history.materials())
+price_date = st.date_input("Prices As Of", value=date.today())
+grades = [""] + price_history.grades(material_type)
+grade_cols = st.columns(2)
+pipe_grade = grade_cols[0].selectbox("Pipe Grade", grades, format_func=lambda grade: grade or "Standard")
+shaft_grade = grade_cols[1].selectbox("Shaft Grade", grades, format_func=lambda grade: grade or "Standard")
+pipe_rate = price_history.lookup(material_type, pipe_grade, price_date)
+shaft_rate = price_history.lookup(material_type, shaft_grade, price_date)
 
 st.subheader("🧮 Idler Dimensions")
-idler_type = st.selectbox("Idler Type", ["Carrying", "Return", "Impact"])
+idler_type = st.selectbox("Idler Type", IDLER_TYPES)
 pipe_od = st.number_input("Pipe Outside Diameter (mm)", min_value=10.0)
 pipe_thickness = st.number_input("Pipe Thickness (mm)", min_value=1.0)
 pipe_length = st.number_input("Pipe Length (mm)", min_value=50.0)
@@ -48,21 +97,54 @@ shaft_dia = st.number_input("Shaft Diameter (mm)", min_value=10.0)
 shaft_length = st.number_input("Shaft Length (mm)", min_value=50.0)
 
 st.subheader("📦 Raw Material Prices (₹/kg)")
-pipe_price = st.number_input("Pipe Price", min_value=1.0)
-shaft_price = st.number_input("Shaft Price", min_value=1.0)
-
-pipe_weight = calc_pipe_weight(pipe_od, pipe_thickness, pipe_length, density)
-shaft_weight = calc_shaft_weight(shaft_dia, shaft_length, density)
+pipe_price = st.number_input("Pipe Price", min_value=1.0, value=max(pipe_rate["Price"] or 1.0, 1.0))
+shaft_price = st.number_input("Shaft Price", min_value=1.0, value=max(shaft_rate["Price"] or 1.0, 1.0))
+with st.expander("📈 Material Price History"):
+    st.dataframe(price_history.history(material_type), hide_index=True)
+    with st.form("add_material_price", clear_on_submit=True):
+        new_material = st.text_input("Material", value=material_type)
+        new_grade = st.text_input("Grade (blank for the standard price)")
+        effective = st.date_input("Effective From", value=date.today())
+        new_price = st.number_input("Price (₹/kg, 0 to leave unchanged)", min_value=0.0)
+        new_density = st.number_input("Density (g/cm³, 0 to leave unchanged)", min_value=0.0)
+        if st.form_submit_button("💾 Record Price"):
+            try:
+                add_price(new_material, new_grade, effective, new_price, new_density)
+            except ValueError as e:
+                st.error(f"❌ {e}")
+            else:
+                st.rerun()
+density = pipe_rate["Density"] or shaft_rate["Density"]
+if density is None:
+    st.error(f"❌ No density recorded for {material_type}. Add one under Material Price History.")
+    st.stop()
 
-pipe_cost = pipe_weight * pipe_price
-shaft_cost = shaft_weight * shaft_price
+# Prefill prices from the closest catalogue entries
+estimate = {}
+if use_rag:
+    neighbours, estimate = get_catalogue(MASTER_FILE).nearest({
+        "Pipe OD": pipe_od,
+        "Shaft Dia": shaft_dia,
+        "Pipe Length": pipe_length,
+        "Material": material_type,
+        "Idler Type": idler_type
+    })
+    if neighbours.empty:
+        st.info(f"No entries in {MASTER_FILE} yet. Please enter prices manually.")
+    else:
+        st.caption("Prices below are interpolated from the closest catalogue entries:")
+        st.dataframe(neighbours)
+    estimate = {name: round(cost, 2) for name, cost in estimate.items()}
+    # This page has a single machining input for all machining/fabrication steps
+    estimate["Machining"] = round(sum(estimate.get(name, 0.0) for name in [
+        "Machining", "Pipe Machining", "Rod Machining", "Rod Milling", "Welding", "Handling", "Assembly"]), 2)
 
 st.subheader("🛒 Bought-out Components (Auto x2)")
-bearing_price = st.number_input("Bearing Price (each)", min_value=0.0)
-cup_price = st.number_input("Cup Price (each)", min_value=0.0)
-dustcover_price = st.number_input("Dust Cover Price (each)", min_value=0.0)
-seal_price = st.number_input("Labyrinth Seal Price (each)", min_value=0.0)
-circlip_price = st.number_input("Circlip Price (each)", min_value=0.0)
+bearing_price = st.number_input("Bearing Price (each)", min_value=0.0, value=estimate.get("Bearing Cost", 0.0))
+cup_price = st.number_input("Cup Price (each)", min_value=0.0, value=estimate.get("Cup Cost", 0.0))
+dustcover_price = st.number_input("Dust Cover Price (each)", min_value=0.0, value=estimate.get("Dust Cover Cost", 0.0))
+seal_price = st.number_input("Labyrinth Seal Price (each)", min_value=0.0, value=estimate.get("Seal Cost", 0.0))
+circlip_price = st.number_input("Circlip Price (each)", min_value=0.0, value=estimate.get("Circlip Cost", 0.0))
 
 bought_out_cost = 2 * (bearing_price + cup_price + dustcover_price + seal_price + circlip_price)
 
@@ -76,24 +158,72 @@ if idler_type == "Impact":
     rubber_ring_cost = num_rings * cost_per_ring
 
 st.subheader("⚙️ Conversion Costs")
-machining_cost = st.number_input("Machining", min_value=0.0)
-painting_cost = st.number_input("Painting", min_value=0.0)
-testing_cost = st.number_input("Testing", min_value=0.0)
+machining_cost = st.number_input("Machining", min_value=0.0, value=estimate.get("Machining", 0.0))
+painting_cost = st.number_input("Painting", min_value=0.0, value=estimate.get("Painting", 0.0))
+testing_cost = st.number_input("Testing", min_value=0.0, value=estimate.get("Testing", 0.0))
 
 conversion_cost = machining_cost + painting_cost + testing_cost
-base_cost = pipe_cost + shaft_cost + bought_out_cost + rubber_ring_cost + rubber_fixing_cost + conversion_cost
 
 # Overhead and Profit
 st.subheader("📈 Overhead & Profit")
 profit_pct = st.slider("Select Profit Margin (%)", min_value=15, max_value=20, value=15)
-overhead_cost = base_cost * 0.10
-profit_cost = (base_cost + overhead_cost) * (profit_pct / 100)
-final_cost = base_cost + overhead_cost + profit_cost
+
+# Only the nodes downstream of changed inputs are recomputed
+graph = st.session_state.estimate_cost_graph
+with span("cost graph"):
+    graph.update(
+        pipe_od=pipe_od, pipe_thickness=pipe_thickness, pipe_length=pipe_length,
+        shaft_dia=shaft_dia, shaft_length=shaft_length, density=density,
+        pipe_price=pipe_price, shaft_price=shaft_price, component_cost=bought_out_cost,
+        rubber_cost=rubber_ring_cost + rubber_fixing_cost, conversion_cost=conversion_cost, profit_pct=profit_pct
+    )
+pipe_weight, shaft_weight = graph["pipe_weight"], graph["shaft_weight"]
+pipe_cost, shaft_cost = graph["pipe_cost"], graph["shaft_cost"]
+overhead_cost, profit_cost, final_cost = graph["overhead"], graph["profit"], graph["final"]
+with st.sidebar.expander("⚙️ Recalculated this run"):
+    st.write(", ".join(graph.recomputed) or "Nothing changed")
+
+# Design sweep: cheapest/lightest thickness and shaft combinations for this OD
+with st.expander("🎯 Design Sweep"):
+    thickness_text = st.text_input("Pipe Thicknesses (mm, comma separated)", "3, 3.5, 4, 4.5, 5")
+    shaft_text = st.text_input("Shaft Diameters (mm, comma separated)", "20, 25, 30, 35, 40")
+    sweep_rates = {m: price_history.lookup(m, on=price_date) for m in price_history.materials()}
+    sweep_rates[material_type] = {"Price": pipe_price, "Density": density}
+    sweep_materials = st.multiselect("Materials", [m for m, rate in sweep_rates.items() if rate["Density"]],
+                                     default=[material_type])
+    margin_range = st.slider("Profit Margins (%)", min_value=15, max_value=20, value=(15, 20))
+    sweep_prices = {}
+    for m in sweep_materials:
+        cols = st.columns(2)
+        sweep_prices[m] = (
+            cols[0].number_input(f"{m} Pipe Price (₹/kg)", min_value=1.0,
+                                 value=pipe_price if m == material_type else max(sweep_rates[m]["Price"] or pipe_price, 1.0)),
+            cols[1].number_input(f"{m} Shaft Price (₹/kg)", min_value=1.0,
+                                 value=shaft_price if m == material_type else max(sweep_rates[m]["Price"] or shaft_price, 1.0))
+        )
+    if st.button("Run Sweep") and sweep_materials:
+        try:
+            thicknesses = [float(x) for x in thickness_text.split(",") if x.strip()]
+            shaft_dias = [float(x) for x in shaft_text.split(",") if x.strip()]
+        except ValueError:
+            st.error("❌ Thicknesses and shaft diameters must be numbers separated by commas.")
+        else:
+            # Parts and conversion per size come from the master catalogue; this
+            # screen's figures stand in for the current size and unknown sizes
+            size_costs = catalogue_size_costs(get_catalogue(MASTER_FILE), pipe_od, shaft_dias,
+                                              default=bought_out_cost + conversion_cost)
+            size_costs[(float(pipe_od), float(shaft_dia))] = bought_out_cost + conversion_cost
+            front, combinations = sweep(pipe_od, thicknesses, pipe_length, shaft_dias, shaft_length,
+                                        sweep_materials, range(margin_range[0], margin_range[1] + 1),
+                                        sweep_prices, other_cost=rubber_ring_cost + rubber_fixing_cost, size_costs=size_costs,
+                                        densities={m: sweep_rates[m]["Density"] for m in sweep_materials})
+            st.write(f"Evaluated {combinations:,} combinations. Best weight/cost trade-offs:")
+            st.dataframe(front)
 
 # Save entry
 if st.button("➕ Add Idler"):
     label = f"{pipe_od}mmOD x {pipe_length}LG {idler_type} Idler ({material_type})"
-    st.session_state.idler_data.append({
+    st.session_state.estimate_data.append({
         "Company": "STEADFAST",
         "Material": material_type,
         "Idler Type": idler_type,
@@ -117,17 +247,20 @@ if st.button("➕ Add Idler"):
     st.success(f"✅ Added: {label} → ₹{round(final_cost, 2)}")
 
 # Display & Export
-if st.session_state.idler_data:
+if st.session_state.estimate_data:
     st.subheader("📊 Estimation Summary")
-    df = pd.DataFrame(st.session_state.idler_data)
-    st.dataframe(df)
+    st.dataframe(st.session_state.estimate_data.to_frame())
 
-    buffer = BytesIO()
-    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False)
+    # The file is only built when the button is clicked, then reused until the list changes
+    formats = [f for f in EXPORT_FORMATS if f != "Parquet" or parquet_available()]
+    export_format = st.radio("Export Format", formats, horizontal=True)
+    extension, mime = EXPORT_FORMATS[export_format]
     st.download_button(
-        label="📥 Download Excel",
-        data=buffer.getvalue(),
-        file_name="STEADFAST_idler_estimation.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        label=f"📥 Download {export_format}",
+        data=partial(export_bytes, st.session_state.estimate_export_cache, st.session_state.estimate_data.version,
+                     export_format, st.session_state.estimate_data, st.session_state.estimate_data.columns),
+        file_name=f"STEADFAST_idler_estimation.{extension}",
+        mime=mime
     )
+
+debug_panel.show(run)
@@ -1,75 +1,31 @@
+import os
 import streamlit as st
 from datetime import datetime, timedelta
-import requests
-import jwt
-import json
+import debug_panel
+from zoom_client import ZOOM_API, ZoomClient, daily_starts
 
 # --- Zoom API Setup ---
 API_KEY = "YOUR_ZOOM_API_KEY"
 API_SECRET = "YOUR_ZOOM_API_SECRET"
 USER_ID = "your_zoom_email@example.com"
+MEETING_TIME = "04:30"
+# Point at a local mock server for testing, e.g. ZOOM_API_URL=http://127.0.0.1:8000
+API_URL = os.environ.get("ZOOM_API_URL", ZOOM_API)
 
-# Generate JWT Token
-def generate_jwt_token():
-    payload = {
-        'iss': API_KEY,
-        'exp': datetime.utcnow() + timedelta(minutes=5)
-    }
-    token = jwt.encode(payload, API_SECRET, algorithm='HS256')
-    return token
+# One pooled keep-alive session and one reusable JWT for the whole server
+@st.cache_resource
+def get_zoom_client():
+    return ZoomClient(API_KEY, API_SECRET, USER_ID, base_url=API_URL)
 
 # Create Zoom Meeting with fixed password
 def create_zoom_meeting(start_time):
-    token = generate_jwt_token()
-    headers = {
-        'authorization': f"Bearer {token}",
-        'content-type': "application/json"
-    }
-
-    meeting_details = {
-        "topic": "Miracle Morning Meeting",
-        "type": 2,
-        "start_time": start_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
-        "duration": 90,
-        "password": "1234",
-        "settings": {
-            "join_before_host": True,
-            "mute_upon_entry": True
-        }
-    }
-
-    response = requests.post(
-        f"https://api.zoom.us/v2/users/{USER_ID}/meetings",
-        headers=headers,
-        data=json.dumps(meeting_details)
-    )
-
-    if response.status_code == 201:
-        return response.json()
-    else:
-        return None
-
-# --- Streamlit App ---
-st.set_page_config(page_title="Miracle Morning Zoom Link Generator", page_icon="🌄")
-st.title("🌄 Miracle Morning Zoom Link Generator")
-
-st.markdown("""
-Generate your daily Zoom meeting link with a fixed password and prepare your WhatsApp message.
-""")
-
-# Date Selection
-default_date = datetime.now() + timedelta(days=1)
-meeting_date = st.date_input("Select Meeting Date", value=default_date.date())
-
-if st.button("Generate Zoom Link & Message"):
-    meeting_start_time = datetime.combine(meeting_date, datetime.strptime("04:30", "%H:%M").time())
-    meeting_data = create_zoom_meeting(meeting_start_time)
-
-    if meeting_data:
-        zoom_link = meeting_data['join_url']
-        meeting_id = meeting_data['id']
+    return get_zoom_client().create_meeting(start_time)
 
-        message = f"""
+# WhatsApp message for one day's meeting
+def whatsapp_message(meeting_date, meeting_data):
+    zoom_link = meeting_data['join_url']
+    meeting_id = meeting_data['id']
+    return f"""
 ✳✳✳✳✳✳✳✳✳✳
 
 ⭕ Welcome  to  Miracle morning🙏
@@ -97,7 +53,55 @@ Live Session from 5:00am
 
 ✳✳✳✳✳✳✳✳✳✳
 """
+
+# --- Streamlit App ---
+st.set_page_config(page_title="Miracle Morning Zoom Link Generator", page_icon="🌄")
+run = debug_panel.begin("MMzoomlinkcreate_hybrid")
+st.title("🌄 Miracle Morning Zoom Link Generator")
+
+st.markdown("""
+Generate your daily Zoom meeting link with a fixed password and prepare your WhatsApp message.
+""")
+
+# Date Selection
+default_date = datetime.now() + timedelta(days=1)
+meeting_date = st.date_input("Select Meeting Date", value=default_date.date())
+
+if st.button("Generate Zoom Link & Message"):
+    meeting_start_time = datetime.combine(meeting_date, datetime.strptime(MEETING_TIME, "%H:%M").time())
+    meeting_data = create_zoom_meeting(meeting_start_time)
+
+    if meeting_data:
+        message = whatsapp_message(meeting_date, meeting_data)
         st.success("✅ Zoom Meeting Created Successfully!")
         st.text_area("Here is your WhatsApp Message:", value=message, height=300)
     else:
-        st.error("❌ Failed to create Zoom meeting. Please check API credentials.")
\ No newline at end of file
+        st.error("❌ Failed to create Zoom meeting. Please check API credentials.")
+
+# --- Batch mode: a whole month of sessions in one go ---
+st.markdown("---")
+st.subheader("📅 Schedule a Date Range")
+col1, col2 = st.columns(2)
+first_day = col1.date_input("From", value=default_date.date(), key="batch_from")
+last_day = col2.date_input("To", value=default_date.date() + timedelta(days=29), key="batch_to")
+
+if st.button("Generate All Links & Messages", disabled=last_day < first_day):
+    days = [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
+    with st.spinner(f"Creating {len(days)} meetings..."):
+        meetings = get_zoom_client().create_meetings(daily_starts(first_day, last_day, MEETING_TIME))
+    failed = [day for day, meeting in zip(days, meetings) if meeting is None]
+    messages = [whatsapp_message(day, meeting) for day, meeting in zip(days, meetings) if meeting]
+    if messages:
+        st.success(f"✅ {len(messages)} Zoom Meetings Created!")
+        st.download_button("📥 Download All Messages", "\n".join(messages),
+                           file_name=f"miracle_morning_{first_day}_{last_day}.txt")
+        for day, meeting in zip(days, meetings):
+            if meeting:
+                with st.expander(day.strftime('%B %d - %Y %A')):
+                    st.text_area("WhatsApp Message", value=whatsapp_message(day, meeting), height=300,
+                                 key=f"message_{day}")
+    if failed:
+        st.error("❌ Failed for " + ", ".join(day.strftime('%b %d') for day in failed)
+                 + ". Please check API credentials and try those dates again.")
+
+debug_panel.show(run)
@@ -1,60 +1,112 @@
 import streamlit as st
 import pandas as pd
-import math
 from io import BytesIO
-import os
+from datetime import date
+from functools import partial
 
-# Constants
-MATERIAL_DENSITY = {"Mild Steel": 7.85, "Stainless Steel": 8.0}
-MASTER_FILE = "idler_master.xlsx"
+import debug_panel
+from estimate_export import EXPORT_FORMATS, export_bytes, parquet_available
+from estimate_store import ColumnStore
+from idler_costing import IDLER_TYPES, cost_idlers, idler_cost_graph
+from idler_master import MASTER_FILE, append_entry, compact, get_catalogue, pending_count
+from idler_sweep import catalogue_size_costs, sweep
+from material_prices import add_price, fill_bom_prices, get_price_history
+from profiling import span
+from sheet_cache import read_key_values
 
-# Load master sheet
+# Load master sheet (parsed once, shared across sessions until the file changes)
 def load_master():
-    if os.path.exists(MASTER_FILE):
-        return pd.read_excel(MASTER_FILE)
-    else:
-        return pd.DataFrame()
+    return get_catalogue(MASTER_FILE).df
 
-# Save new entry to master
+# Save new entry to master (journalled, folded into the workbook on commit)
 def save_to_master(entry):
-    df = load_master()
-    df = pd.concat([df, pd.DataFrame([entry])], ignore_index=True)
-    df.to_excel(MASTER_FILE, index=False)
+    return append_entry(entry, MASTER_FILE)
 
 # Match pipe size
 def match_pipe(pipe_od, shaft_dia):
-    df = load_master()
-    match = df[(df["Pipe OD"] == pipe_od) & (df["Shaft Dia"] == shaft_dia)]
-    return match.iloc[0] if not match.empty else None
-
-# Weight calculations
-def calc_pipe_weight(od, thickness, length, density):
-    outer_radius = od / 2
-    inner_radius = outer_radius - thickness
-    volume_mm3 = math.pi * ((outer_radius**2 - inner_radius**2)) * length
-    volume_cm3 = volume_mm3 / 1000
-    return round((volume_cm3 * density) / 1000, 2)
-
-def calc_shaft_weight(dia, length, density):
-    radius = dia / 2
-    volume_mm3 = math.pi * (radius**2) * length
-    volume_cm3 = volume_mm3 / 1000
-    return round((volume_cm3 * density) / 1000, 2)
+    return get_catalogue(MASTER_FILE).lookup(pipe_od, shaft_dia)
+
+# Closest catalogue entries for a size that has no exact match
+def nearest_entries(pipe_od, shaft_dia, pipe_length, material, idler_type, k=3):
+    query = {
+        "Pipe OD": pipe_od,
+        "Shaft Dia": shaft_dia,
+        "Pipe Length": pipe_length,
+        "Material": material,
+        "Idler Type": idler_type
+    }
+    return get_catalogue(MASTER_FILE).nearest(query, k)
+
+# Columns of the estimation list
+IDLER_COLUMNS = {
+    "Label": "category",
+    "Pipe Cost": "float",
+    "Shaft Cost": "float",
+    "Component Cost": "float",
+    "Rubber Cost": "float",
+    "Conversion Cost": "float",
+    "Overhead": "float",
+    "Profit": "float",
+    "Final Cost": "float"
+}
+
+# Session state
+if "idler_data" not in st.session_state:
+    st.session_state.idler_data = ColumnStore(IDLER_COLUMNS)
+    st.session_state.idler_export_cache = {}
+if "cost_graph" not in st.session_state:
+    st.session_state.cost_graph = idler_cost_graph()
 
 # UI
+run = debug_panel.begin("SFNew_IdlerEst")
 st.title("🔩 STEADFAST Intelligent Idler Estimator")
 
 use_rag = st.checkbox("Use RAG to auto-fetch component costs")
 
-material = st.selectbox("Material", ["Mild Steel", "Stainless Steel"])
-density = MATERIAL_DENSITY[material]
+# Prices and density in effect on the quote date (requote old estimates by changing it)
+price_history = get_price_history()
+material = st.selectbox("Material", price_history.materials())
+price_date = st.date_input("Prices As Of", value=date.today())
+grades = [""] + price_history.grades(material)
+grade_cols = st.columns(2)
+pipe_grade = grade_cols[0].selectbox("Pipe Grade", grades, format_func=lambda grade: grade or "Standard")
+shaft_grade = grade_cols[1].selectbox("Shaft Grade", grades, format_func=lambda grade: grade or "Standard")
+pipe_rate = price_history.lookup(material, pipe_grade, price_date)
+shaft_rate = price_history.lookup(material, shaft_grade, price_date)
+
+st.subheader("📑 Batch BOM Costing")
+bom_file = st.file_uploader("Upload BOM Excel (one idler per row)", type=["xlsx"], key="bom_file")
+if bom_file:
+    try:
+        with span("read BOM"):
+            bom_df = pd.read_excel(bom_file)
+        # Blank price cells priced as of each row's Quote Date
+        costed_df, rejected = cost_idlers(fill_bom_prices(bom_df), get_price_history().densities())
+    except ValueError as e:
+        st.error(f"❌ {e}")
+    else:
+        if not rejected.empty:
+            st.warning(f"{len(rejected)} rows skipped:")
+            st.dataframe(rejected)
+        st.dataframe(costed_df)
+        st.write(f"**Total for {len(costed_df)} idlers:** ₹{round(costed_df['Final Cost'].sum(), 2)}")
+        bom_buffer = BytesIO()
+        with span("write costed BOM"), pd.ExcelWriter(bom_buffer, engine='openpyxl') as writer:
+            costed_df.to_excel(writer, index=False)
+        st.download_button(
+            label="📥 Download Costed BOM",
+            data=bom_buffer.getvalue(),
+            file_name="STEADFAST_bom_costing.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
 
 st.subheader("📂 Upload Existing Idler Specs")
 uploaded_file = st.file_uploader("Upload Excel file", type=["xlsx"])
 
+data_dict = {}
 if uploaded_file:
-    uploaded_df = pd.read_excel(uploaded_file, header=None)  # Read without headers
-    data_dict = dict(zip(uploaded_df.iloc[:, 1], uploaded_df.iloc[:, 2]))
+    # Read without headers, streaming only the label/value columns
+    data_dict = read_key_values(uploaded_file)
 
 # Access values safely (or handle missing ones gracefully)
 pipe_od = data_dict.get("Pipe OD")
@@ -67,20 +119,34 @@ new_entry_df = pd.DataFrame([{
 }])
 
  
-idler_type = st.selectbox("Idler Type", ["Carrying", "Return", "Impact"])
+idler_type = st.selectbox("Idler Type", IDLER_TYPES)
 pipe_od = st.number_input("Pipe OD (mm)", min_value=10.0)
 pipe_thickness = st.number_input("Pipe Thickness (mm)", min_value=1.0)
 pipe_length = st.number_input("Pipe Length (mm)", min_value=50.0)
 shaft_dia = st.number_input("Shaft Dia (mm)", min_value=10.0)
 shaft_length = st.number_input("Shaft Length (mm)", min_value=50.0)
 
-pipe_price = st.number_input("Pipe Price (₹/kg)", min_value=1.0)
-shaft_price = st.number_input("Shaft Price (₹/kg)", min_value=1.0)
-
-pipe_weight = calc_pipe_weight(pipe_od, pipe_thickness, pipe_length, density)
-shaft_weight = calc_shaft_weight(shaft_dia, shaft_length, density)
-pipe_cost = pipe_weight * pipe_price
-shaft_cost = shaft_weight * shaft_price
+pipe_price = st.number_input("Pipe Price (₹/kg)", min_value=1.0, value=max(pipe_rate["Price"] or 1.0, 1.0))
+shaft_price = st.number_input("Shaft Price (₹/kg)", min_value=1.0, value=max(shaft_rate["Price"] or 1.0, 1.0))
+with st.expander("📈 Material Price History"):
+    st.dataframe(price_history.history(material), hide_index=True)
+    with st.form("add_material_price", clear_on_submit=True):
+        new_material = st.text_input("Material", value=material)
+        new_grade = st.text_input("Grade (blank for the standard price)")
+        effective = st.date_input("Effective From", value=date.today())
+        new_price = st.number_input("Price (₹/kg, 0 to leave unchanged)", min_value=0.0)
+        new_density = st.number_input("Density (g/cm³, 0 to leave unchanged)", min_value=0.0)
+        if st.form_submit_button("💾 Record Price"):
+            try:
+                add_price(new_material, new_grade, effective, new_price, new_density)
+            except ValueError as e:
+                st.error(f"❌ {e}")
+            else:
+                st.rerun()
+density = pipe_rate["Density"] or shaft_rate["Density"]
+if density is None:
+    st.error(f"❌ No density recorded for {material}. Add one under Material Price History.")
+    st.stop()
 
 # RAG or manual entry
 if use_rag:
@@ -98,23 +164,32 @@ if use_rag:
         rod_milling = match["Rod Milling"]
         assembly = match["Assembly"]
     else:
-        st.warning("Pipe size not found. Please enter manually.")
-        bearing_cost = st.number_input("Bearing Cost (each)", min_value=0.0) * 2
-        cup_cost = st.number_input("Cup Cost (each)", min_value=0.0) * 2
-        seal_cost = st.number_input("Seal Set Cost (each)", min_value=0.0) * 2
-        circlip_cost = st.number_input("Circlip Cost (each)", min_value=0.0) * 2
-        painting = st.number_input("Painting Cost", min_value=0.0)
-        welding = st.number_input("Welding Cost", min_value=0.0)
-        handling = st.number_input("Handling Cost", min_value=0.0)
-        pipe_machining = st.number_input("Pipe Machining Cost", min_value=0.0)
-        rod_machining = st.number_input("Rod Machining Cost", min_value=0.0)
-        rod_milling = st.number_input("Rod Milling Cost", min_value=0.0)
-        assembly = st.number_input("Assembly Cost", min_value=0.0)
-
-        # Save new entry
+        neighbours, estimate = nearest_entries(pipe_od, shaft_dia, pipe_length, material, idler_type)
+        if neighbours.empty:
+            st.warning("Pipe size not found. Please enter manually.")
+        else:
+            st.warning("Pipe size not found. Costs below are interpolated from the closest catalogue entries - please check them.")
+            st.dataframe(neighbours)
+        estimate = {name: round(cost, 2) for name, cost in estimate.items()}
+        bearing_cost = st.number_input("Bearing Cost (each)", min_value=0.0, value=estimate.get("Bearing Cost", 0.0)) * 2
+        cup_cost = st.number_input("Cup Cost (each)", min_value=0.0, value=estimate.get("Cup Cost", 0.0)) * 2
+        seal_cost = st.number_input("Seal Set Cost (each)", min_value=0.0, value=estimate.get("Seal Cost", 0.0)) * 2
+        circlip_cost = st.number_input("Circlip Cost (each)", min_value=0.0, value=estimate.get("Circlip Cost", 0.0)) * 2
+        painting = st.number_input("Painting Cost", min_value=0.0, value=estimate.get("Painting", 0.0))
+        welding = st.number_input("Welding Cost", min_value=0.0, value=estimate.get("Welding", 0.0))
+        handling = st.number_input("Handling Cost", min_value=0.0, value=estimate.get("Handling", 0.0))
+        pipe_machining = st.number_input("Pipe Machining Cost", min_value=0.0, value=estimate.get("Pipe Machining", 0.0))
+        rod_machining = st.number_input("Rod Machining Cost", min_value=0.0, value=estimate.get("Rod Machining", 0.0))
+        rod_milling = st.number_input("Rod Milling Cost", min_value=0.0, value=estimate.get("Rod Milling", 0.0))
+        assembly = st.number_input("Assembly Cost", min_value=0.0, value=estimate.get("Assembly", 0.0))
+
+        # Save new entry once the user confirms the values
         new_entry = {
             "Pipe OD": pipe_od,
             "Shaft Dia": shaft_dia,
+            "Pipe Length": pipe_length,
+            "Material": material,
+            "Idler Type": idler_type,
             "Bearing Cost": bearing_cost / 2,
             "Cup Cost": cup_cost / 2,
             "Seal Cost": seal_cost / 2,
@@ -127,7 +202,15 @@ if use_rag:
             "Rod Milling": rod_milling,
             "Assembly": assembly
         }
-        save_to_master(new_entry)
+        if st.button("💾 Save to Master"):
+            if save_to_master(new_entry):
+                st.success("✅ Saved to master catalogue.")
+            else:
+                st.info("This size is already in the master catalogue.")
+
+    pending = pending_count(MASTER_FILE)
+    if pending and st.button(f"📝 Commit {pending} new entries to {MASTER_FILE}", key="commit_master"):
+        st.success(f"✅ Committed {compact(MASTER_FILE)} entries.")
 else:
     bearing_cost = st.number_input("Bearing Cost (each)", min_value=0.0) * 2
     cup_cost = st.number_input("Cup Cost (each)", min_value=0.0) * 2
@@ -151,14 +234,58 @@ if idler_type == "Impact":
 
 profit_pct = st.slider("Profit Margin (%)", min_value=15, max_value=20, value=15)
 
-# Final cost calculation
-base = pipe_cost + shaft_cost + bearing_cost + cup_cost + seal_cost + circlip_cost + \
-       painting + welding + handling + pipe_machining + rod_machining + rod_milling + \
-       assembly + rubber_cost + fixing_cost
+# Final cost calculation, only the nodes downstream of changed inputs are recomputed
+component_cost = bearing_cost + cup_cost + seal_cost + circlip_cost
+conversion_cost = painting + welding + handling + pipe_machining + rod_machining + rod_milling + assembly
+graph = st.session_state.cost_graph
+with span("cost graph"):
+    graph.update(
+        pipe_od=pipe_od, pipe_thickness=pipe_thickness, pipe_length=pipe_length,
+        shaft_dia=shaft_dia, shaft_length=shaft_length, density=density,
+        pipe_price=pipe_price, shaft_price=shaft_price, component_cost=component_cost,
+        rubber_cost=rubber_cost + fixing_cost, conversion_cost=conversion_cost, profit_pct=profit_pct
+    )
+pipe_cost, shaft_cost = graph["pipe_cost"], graph["shaft_cost"]
+base, overhead, profit, final = graph["base"], graph["overhead"], graph["profit"], graph["final"]
+with st.sidebar.expander("⚙️ Recalculated this run"):
+    st.write(", ".join(graph.recomputed) or "Nothing changed")
 
-overhead = base * 0.10
-profit = (base + overhead) * (profit_pct / 100)
-final = base + overhead + profit
+# Design sweep: cheapest/lightest thickness and shaft combinations for this OD
+with st.expander("🎯 Design Sweep"):
+    thickness_text = st.text_input("Pipe Thicknesses (mm, comma separated)", "3, 3.5, 4, 4.5, 5")
+    shaft_text = st.text_input("Shaft Diameters (mm, comma separated)", "20, 25, 30, 35, 40")
+    sweep_rates = {m: price_history.lookup(m, on=price_date) for m in price_history.materials()}
+    sweep_rates[material] = {"Price": pipe_price, "Density": density}
+    sweep_materials = st.multiselect("Materials", [m for m, rate in sweep_rates.items() if rate["Density"]],
+                                     default=[material])
+    margin_range = st.slider("Profit Margins (%)", min_value=15, max_value=20, value=(15, 20))
+    sweep_prices = {}
+    for m in sweep_materials:
+        cols = st.columns(2)
+        sweep_prices[m] = (
+            cols[0].number_input(f"{m} Pipe Price (₹/kg)", min_value=1.0,
+                                 value=pipe_price if m == material else max(sweep_rates[m]["Price"] or pipe_price, 1.0)),
+            cols[1].number_input(f"{m} Shaft Price (₹/kg)", min_value=1.0,
+                                 value=shaft_price if m == material else max(sweep_rates[m]["Price"] or shaft_price, 1.0))
+        )
+    if st.button("Run Sweep") and sweep_materials:
+        try:
+            thicknesses = [float(x) for x in thickness_text.split(",") if x.strip()]
+            shaft_dias = [float(x) for x in shaft_text.split(",") if x.strip()]
+        except ValueError:
+            st.error("❌ Thicknesses and shaft diameters must be numbers separated by commas.")
+        else:
+            # Parts and conversion per size come from the master catalogue; this
+            # screen's figures stand in for the current size and unknown sizes
+            size_costs = catalogue_size_costs(get_catalogue(MASTER_FILE), pipe_od, shaft_dias,
+                                              default=component_cost + conversion_cost)
+            size_costs[(float(pipe_od), float(shaft_dia))] = component_cost + conversion_cost
+            front, combinations = sweep(pipe_od, thicknesses, pipe_length, shaft_dias, shaft_length,
+                                        sweep_materials, range(margin_range[0], margin_range[1] + 1),
+                                        sweep_prices, other_cost=rubber_cost + fixing_cost, size_costs=size_costs,
+                                        densities={m: sweep_rates[m]["Density"] for m in sweep_materials})
+            st.write(f"Evaluated {combinations:,} combinations. Best weight/cost trade-offs:")
+            st.dataframe(front)
 
 if st.button("➕ Add to Estimation"):
     label = f"{pipe_od}mmOD x {pipe_length}LG {idler_type} Idler ({material})"
@@ -166,11 +293,31 @@ if st.button("➕ Add to Estimation"):
     "Label": label,
     "Pipe Cost": round(pipe_cost, 2),
     "Shaft Cost": round(shaft_cost, 2),
-    "Component Cost": round(bearing_cost + cup_cost + seal_cost + circlip_cost, 2),
+    "Component Cost": round(component_cost, 2),
     "Rubber Cost": round(rubber_cost + fixing_cost, 2),
-    "Conversion Cost": round(painting + welding + handling + pipe_machining + 
-                             rod_machining + rod_milling + assembly, 2),
+    "Conversion Cost": round(conversion_cost, 2),
     "Overhead": round(overhead, 2),
     "Profit": round(profit, 2),
     "Final Cost": round(final, 2)
 }
+    st.session_state.idler_data.append(entry)
+    st.success(f"✅ Added: {label} → ₹{round(final, 2)}")
+
+# Display & Export
+if st.session_state.idler_data:
+    st.subheader("📊 Estimation Summary")
+    st.dataframe(st.session_state.idler_data.to_frame())
+
+    # The file is only built when the button is clicked, then reused until the list changes
+    formats = [f for f in EXPORT_FORMATS if f != "Parquet" or parquet_available()]
+    export_format = st.radio("Export Format", formats, horizontal=True)
+    extension, mime = EXPORT_FORMATS[export_format]
+    st.download_button(
+        label=f"📥 Download {export_format}",
+        data=partial(export_bytes, st.session_state.idler_export_cache, st.session_state.idler_data.version,
+                     export_format, st.session_state.idler_data, st.session_state.idler_data.columns),
+        file_name=f"STEADFAST_idler_estimation.{extension}",
+        mime=mime
+    )
+
+debug_panel.show(run)
@@ -0,0 +1,332 @@
+import argparse
+import gc
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from idler_costing import (MATERIAL_DENSITY, calc_pipe_weight, calc_shaft_weight, cost_idlers, cost_records,
+                           idler_cost_graph)
+from estimate_store import ColumnStore
+from idler_master import append_entry, get_catalogue, invalidate
+from payroll import compute_payroll, post_payroll
+from material_prices import PriceHistory
+import price_index
+from price_index import PriceIndex, get_price_index
+from sheet_cache import clear_cache
+
+BASELINE_FILE = "benchmark_baseline.json"
+# Throughput drop (fraction) reported as a regression, on top of the noise
+# both runs measured for that case
+REGRESSION_THRESHOLD = 0.20
+# Passes over the suites; each case is judged on its median pass
+REPEATS = 3
+MASTER_SIZES = [1_000, 100_000]
+QUICK_MASTER_SIZES = [1_000]
+
+
+# Times fn over `calls` calls (after a warm-up call), then runs it once more
+# under tracemalloc for peak memory. items is how much work one call does.
+def measure(fn, calls, items=1):
+    fn()
+    gc.collect()
+    times = np.empty(calls)
+    for i in range(calls):
+        start = time.perf_counter()
+        fn()
+        times[i] = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "calls": calls,
+        "items_per_call": items,
+        "throughput": items * calls / times.sum(),
+        "p50_ms": float(np.percentile(times, 50) * 1000),
+        "p99_ms": float(np.percentile(times, 99) * 1000),
+        "peak_mb": peak / 2**20
+    }
+
+
+def spec_rows(n, rng):
+    return pd.DataFrame({
+        "Pipe OD": rng.choice([89.0, 114.3, 127.0, 139.7, 152.4], n),
+        "Pipe Thickness": rng.choice([3.2, 4.0, 4.5], n),
+        "Pipe Length": rng.integers(200, 1600, n).astype(float),
+        "Shaft Dia": rng.choice([20.0, 25.0, 30.0, 35.0, 40.0], n),
+        "Shaft Length": rng.integers(250, 1700, n).astype(float),
+        "Pipe Price": rng.uniform(60, 90, n).round(),
+        "Shaft Price": rng.uniform(65, 95, n).round(),
+        "Bearing Cost": rng.uniform(80, 400, n).round(),
+        "Cup Cost": rng.uniform(20, 80, n).round(),
+        "Material": rng.choice(list(MATERIAL_DENSITY), n),
+        "Idler Type": rng.choice(["Carrying", "Return", "Impact"], n)
+    })
+
+# Master sheet with unique (Pipe OD, Shaft Dia) keys
+def master_rows(n, rng):
+    df = spec_rows(n, rng).drop(columns=["Pipe Price", "Shaft Price"])
+    df["Pipe OD"] = 50 + np.arange(n) * 0.01
+    df["Shaft Dia"] = rng.uniform(15, 60, n).round(2)
+    return df.rename(columns={"Bearing Cost": "Bearing", "Cup Cost": "Housing"})
+
+def price_rows(n, rng):
+    return pd.DataFrame({
+        "Size": [f"M{8 + i % 40} x {i}" for i in range(n)],
+        "Length Inch": rng.choice(["1", "1.5", "2", "3"], n),
+        "MOQ": rng.choice([100, 500, 1000], n),
+        "Final Price": rng.uniform(1, 50, n).round(2)
+    })
+
+
+def bench_costing(rng, quick):
+    results = {}
+    results["calc_pipe_weight"] = measure(lambda: calc_pipe_weight(114.3, 4.5, 1000, 7.85), 20_000)
+    results["calc_shaft_weight"] = measure(lambda: calc_shaft_weight(30, 1100, 7.85), 20_000)
+
+    inputs = dict(pipe_od=114.3, pipe_thickness=4.5, pipe_length=1000, shaft_dia=30, shaft_length=1100,
+                  density=7.85, pipe_price=70, shaft_price=75, component_cost=900, rubber_cost=0,
+                  conversion_cost=350, profit_pct=15)
+    results["cost_chain_full"] = measure(lambda: idler_cost_graph().update(**inputs), 5_000)
+    graph = idler_cost_graph()
+    graph.update(**inputs)
+    margins = itertools.cycle([10.0, 15.0])
+    results["cost_chain_profit_edit"] = measure(lambda: graph.update(profit_pct=next(margins)), 5_000)
+
+    bom = spec_rows(10_000 if quick else 100_000, rng)
+    results["cost_idlers_batch"] = measure(lambda: cost_idlers(bom), 5, items=len(bom))
+    # Quote service paths: one idler per request, and a JSON-sized batch
+    records = itertools.cycle([[spec] for spec in bom.iloc[:1_000].to_dict("records")])
+    results["cost_records_single"] = measure(lambda: cost_records(next(records)), 5_000)
+    batch = bom.iloc[:1_000].to_dict("records")
+    results["cost_records_1000"] = measure(lambda: cost_records(batch), 50, items=len(batch))
+
+    # A session's estimate list: ColumnStore against the plain list of dicts
+    # it replaced. peak MB is what building 50k rows holds; held_mb is the
+    # store's own count of its filled rows.
+    rows = [{"Material": spec["Material"], "Idler Type": spec["Idler Type"],
+             "Idler Label": f"{spec['Pipe OD']}mmOD x {spec['Pipe Length']:.0f}LG {spec['Idler Type']} Idler",
+             **costs} for spec, costs in zip(batch, cost_records(batch))]
+    schema = {"Material": "category", "Idler Type": "category", "Idler Label": "category",
+              **{name: "float" for name in rows[0] if name not in ("Material", "Idler Type", "Idler Label")}}
+    def fill_store():
+        store = ColumnStore(schema)
+        for row in itertools.islice(itertools.cycle(rows), 50_000):
+            store.append(row)
+        return store
+    results["estimate_store_50000"] = {**measure(fill_store, 3, items=50_000),
+                                       "held_mb": fill_store().nbytes() / 2**20}
+    # Each dict gets its own float objects, as rows built by the estimator do
+    results["estimate_dicts_50000"] = measure(
+        lambda: [{name: value * 1.0 if isinstance(value, float) else value for name, value in row.items()}
+                 for row in itertools.islice(itertools.cycle(rows), 50_000)], 3, items=50_000)
+    return results
+
+
+def bench_master(rng, sizes, workdir):
+    results = {}
+    for n in sizes:
+        path = os.path.join(workdir, f"master_{n}.xlsx")
+        master = master_rows(n, rng)
+        master.to_excel(path, index=False)
+        # Cold load: parse the workbook and build the key index
+        def load():
+            invalidate(path)
+            return get_catalogue(path).df
+        results[f"load_master_{n}"] = measure(load, 3 if n > 10_000 else 10, items=n)
+
+        keys = master[["Pipe OD", "Shaft Dia"]].to_numpy()
+        picks = itertools.cycle(keys[rng.integers(0, n, 50_000)])
+        catalogue = get_catalogue(path)
+        results[f"match_pipe_{n}"] = measure(lambda: catalogue.lookup(*next(picks)), 20_000)
+        # A batch of sizes in one call (as the design sweep asks), 1% not in the
+        # master; own generator so the later cases see the same data as before
+        batch = np.concatenate([keys[np.random.default_rng(n).integers(0, n, 9_900)], np.full((100, 2), 1.0)])
+        results[f"match_many_{n}"] = measure(lambda: catalogue.lookup_many(batch[:, 0], batch[:, 1]), 20,
+                                             items=len(batch))
+
+        new_ods = iter(10_000 + np.arange(100_000) * 0.01)
+        entry = master.iloc[0].to_dict()
+        results[f"save_to_master_{n}"] = measure(
+            lambda: append_entry({**entry, "Pipe OD": next(new_ods)}, path), 500)
+    return results
+
+
+def bench_lookup(rng, quick):
+    results = {}
+    n = 10_000 if quick else 100_000
+    table = price_rows(n, rng)
+    buffer = BytesIO()
+    table.iloc[:5_000].to_excel(buffer, index=False)
+    data = buffer.getvalue()
+    # Unseen upload (parse the workbook), after a restart (Arrow cache on disk), in memory
+    def upload():
+        clear_cache()
+        price_index._cache.clear()
+        return get_price_index(data)
+    results["price_index_upload_5000"] = measure(upload, 3, items=5_000)
+    results["price_index_restart_5000"] = measure(lambda: price_index._cache.clear() or get_price_index(data),
+                                                  10, items=5_000)
+    results["price_index_cached"] = measure(lambda: get_price_index(data), 10_000)
+
+    index = PriceIndex.from_sheets({"Sheet1": table})
+    sizes = itertools.cycle(table["Size"].to_numpy())
+    results[f"size_lookup_{n}"] = measure(lambda: index.rows(next(sizes)), 20_000)
+    specs = list(table["Size"].sample(10_000, random_state=0)) + ["missing size"] * 100
+    results[f"bulk_lookup_{n}"] = measure(lambda: index.lookup_many(specs), 10, items=len(specs))
+    typos = itertools.cycle([size[:-1] + "9" for size in table["Size"].sample(5_000, random_state=1)])
+    results[f"fuzzy_lookup_{n}"] = measure(lambda: index.fuzzy(next(typos)), 2_000)
+
+    # Material price history: one as-of lookup, and a whole batch of estimates joined at once
+    materials = [f"Material {i}" for i in range(20)]
+    history = PriceHistory(pd.DataFrame({
+        "Material": rng.choice(materials, n),
+        "Grade": rng.choice(["", "Pipe", "Shaft"], n),
+        "Effective Date": pd.Timestamp("2015-01-01") + pd.to_timedelta(rng.integers(0, 3650, n), "D"),
+        "Price (₹/kg)": rng.uniform(50, 250, n).round(2),
+        "Density (g/cm³)": rng.choice([7.85, 8.0, np.nan], n)
+    }))
+    dates = pd.Timestamp("2015-01-01") + pd.to_timedelta(rng.integers(0, 3650, 50_000), "D")
+    queries = itertools.cycle(zip(rng.choice(materials, 50_000), rng.choice(["", "Pipe"], 50_000), dates.date))
+    results[f"price_as_of_{n}"] = measure(lambda: history.lookup(*next(queries)), 20_000)
+    batch = pd.DataFrame({"Material": rng.choice(materials, 10_000), "Grade": rng.choice(["", "Pipe"], 10_000),
+                          "Date": dates[:10_000]})
+    results[f"price_as_of_join_{n}"] = measure(
+        lambda: history.as_of(batch["Material"], batch["Date"], batch["Grade"]), 20, items=len(batch))
+    return results
+
+
+def bench_payroll(rng, quick, workdir):
+    n = 10_000 if quick else 100_000
+    register = pd.DataFrame({
+        "Name": [f"Worker {i}" for i in range(n)],
+        "Type": rng.choice(["Daily Wage", "Fixed Salary"], n, p=[0.8, 0.2]),
+        "Per Day": rng.uniform(400, 900, n).round(),
+        "Fixed Salary": rng.uniform(15000, 40000, n).round(),
+        "Days Worked": rng.integers(0, 27, n),
+        "OT Hours": rng.integers(0, 40, n),
+        "Advance": rng.choice([0, 500, 1000], n)
+    })
+    results = {"payroll_compute": measure(lambda: compute_payroll(register, "2025-01"), 5, items=n)}
+    rows = compute_payroll(register, "2025-01")[0]
+    db = os.path.join(workdir, "ledger.db")
+    results["payroll_post"] = measure(lambda: post_payroll(rows, db), 3, items=n)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+# One pass over the selected suites, on the same data every time
+def run_pass(quick, groups, label=""):
+    rng = np.random.default_rng(0)
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        # Caches and journals the code writes next to itself land in the temp dir
+        os.chdir(workdir)
+        try:
+            suites = {
+                "costing": lambda: bench_costing(rng, quick),
+                "master": lambda: bench_master(rng, QUICK_MASTER_SIZES if quick else MASTER_SIZES, workdir),
+                "lookup": lambda: bench_lookup(rng, quick),
+                "payroll": lambda: bench_payroll(rng, quick, workdir)
+            }
+            for name, suite in suites.items():
+                if groups and name not in groups:
+                    continue
+                print(f"running {name}{label}...", file=sys.stderr)
+                results.update(suite())
+        finally:
+            # Back out before the temp dir is removed (Windows can't delete the cwd)
+            os.chdir(cwd)
+    return results
+
+
+# The suites are run `repeats` times one pass after another, so a slow spell
+# on the machine lands in one pass instead of every case. Each case keeps its
+# median pass; its noise is half the spread between passes relative to that
+# median (± around it).
+def run(quick=False, groups=None, repeats=REPEATS):
+    passes = [run_pass(quick, groups, f" (pass {i + 1}/{repeats})" if repeats > 1 else "")
+              for i in range(repeats)]
+    results = {}
+    for name in passes[0]:
+        runs = sorted((p[name] for p in passes), key=lambda r: r["throughput"])
+        median = runs[len(runs) // 2]
+        results[name] = {**median, "repeats": repeats,
+                         "noise": (runs[-1]["throughput"] - runs[0]["throughput"]) / 2 / median["throughput"]}
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "quick": quick,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count()
+        },
+        "results": results
+    }
+
+
+def report(current, baseline=None):
+    base = (baseline or {}).get("results", {})
+    regressions = []
+    print(f"{'case':<28}{'items/s':>14}{'noise':>7}{'p50 ms':>10}{'p99 ms':>10}{'peak MB':>9}{'vs base':>10}")
+    for name, r in current["results"].items():
+        change = ""
+        if name in base:
+            delta = r["throughput"] / base[name]["throughput"] - 1
+            change = f"{delta:+.0%}"
+            # Baselines from before repeated passes have no noise figure
+            tolerance = REGRESSION_THRESHOLD + r.get("noise", 0.0) + base[name].get("noise", 0.0)
+            if delta < -tolerance:
+                regressions.append(name)
+                change += " !"
+        print(f"{name:<28}{r['throughput']:>14,.0f}{r.get('noise', 0.0):>7.0%}{r['p50_ms']:>10.3f}{r['p99_ms']:>10.3f}"
+              f"{r['peak_mb']:>9.1f}{change:>10}")
+    return regressions
+
+
+# python benchmark.py [--quick] [--only costing master ...] [--repeats N] [--save-baseline] [--output results.json]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless benchmarks of the costing, lookup and payroll paths")
+    parser.add_argument("--quick", action="store_true", help="smaller inputs (1k master, 10k rows)")
+    parser.add_argument("--only", nargs="+", choices=["costing", "master", "lookup", "payroll"])
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="passes over the suites (median kept)")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--output", help="also write this run's results to a JSON file")
+    args = parser.parse_args()
+
+    current = run(args.quick, args.only, max(1, args.repeats))
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("quick") != args.quick:
+            print("baseline was recorded with a different --quick setting, not comparing", file=sys.stderr)
+            baseline = None
+    regressions = report(current, baseline)
+    for path in filter(None, [args.output, args.baseline if args.save_baseline else None]):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {REGRESSION_THRESHOLD:.0%} plus noise: {', '.join(regressions)}")
+        sys.exit(1)
@@ -0,0 +1,30 @@
+# Small memoized dependency graph. Nodes are listed in dependency order as
+# name -> (input names, function). update() takes the current inputs and only
+# recomputes nodes downstream of an input that actually changed; a node whose
+# new value equals its old one stops the change from spreading further.
+class CostGraph:
+    def __init__(self, nodes):
+        self.nodes = dict(nodes)
+        self.values = {}
+        self.recomputed = []
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+    def update(self, **inputs):
+        changed = set()
+        for name, value in inputs.items():
+            if name not in self.values or self.values[name] != value:
+                self.values[name] = value
+                changed.add(name)
+
+        self.recomputed = []
+        for name, (deps, fn) in self.nodes.items():
+            if name in self.values and not changed.intersection(deps):
+                continue
+            value = fn(*(self.values[dep] for dep in deps))
+            self.recomputed.append(name)
+            if name not in self.values or self.values[name] != value:
+                self.values[name] = value
+                changed.add(name)
+        return self.recomputed
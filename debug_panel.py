@@ -0,0 +1,25 @@
+import streamlit as st
+
+from profiling import DEFAULT_ON, TRACE_FILE, finish_run, start_run, stop_run
+
+
+# Opt-in per session: while the box is ticked, this session's reruns are timed
+def begin(app):
+    with st.sidebar.expander("🐞 Debug"):
+        profile = st.checkbox("Profile reruns", value=DEFAULT_ON, key="profile_reruns")
+        trace = st.checkbox(f"Append spans to {TRACE_FILE}", key="profile_trace", disabled=not profile)
+    if not profile:
+        stop_run()
+        return None
+    return start_run(app, trace)
+
+# Span timings of the rerun that just finished
+def show(run):
+    if run is None:
+        return
+    finish_run(run)
+    with st.sidebar.expander(f"⏱️ This rerun: {run.total_ms:.0f} ms", expanded=True):
+        if run.spans:
+            st.dataframe(run.rows(), hide_index=True)
+        else:
+            st.caption("No instrumented work ran.")
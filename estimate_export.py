@@ -0,0 +1,77 @@
+import csv
+from io import BytesIO, StringIO
+
+import pandas as pd
+from openpyxl import Workbook
+
+from profiling import span
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+# Format name -> (file extension, mime type)
+EXPORT_FORMATS = {
+    "Excel": ("xlsx", XLSX_MIME),
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet")
+}
+
+
+def _columns(rows):
+    columns = []
+    for row in rows:
+        for name in row:
+            if name not in columns:
+                columns.append(name)
+    return columns
+
+
+# Write-only workbook: rows are streamed out instead of held as cell objects
+def write_xlsx(rows, columns=None, sheet_name="Sheet1"):
+    columns = columns or _columns(rows)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    ws.append(columns)
+    for row in rows:
+        ws.append([row.get(name) for name in columns])
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+def write_csv(rows, columns=None):
+    columns = columns or _columns(rows)
+    buffer = StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(rows)
+    # BOM so Excel opens the ₹ headers correctly
+    return buffer.getvalue().encode("utf-8-sig")
+
+# Needs pyarrow (or fastparquet) installed
+def write_parquet(rows, columns=None):
+    if hasattr(rows, "to_frame"):
+        df = rows.to_frame()
+    else:
+        df = pd.DataFrame(list(rows), columns=columns or _columns(rows))
+    buffer = BytesIO()
+    df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+WRITERS = {"Excel": write_xlsx, "CSV": write_csv, "Parquet": write_parquet}
+
+
+# Build an export once per (format, version); a new version drops older files
+def export_bytes(cache, version, fmt, rows, columns=None):
+    if cache.get("version") != version:
+        cache.clear()
+        cache["version"] = version
+    if fmt not in cache:
+        with span(f"write {fmt}"):
+            cache[fmt] = WRITERS[fmt](rows, columns)
+    return cache[fmt]
+
+
+def parquet_available():
+    try:
+        pd.io.parquet.get_engine("auto")
+    except ImportError:
+        return False
+    return True
@@ -0,0 +1,90 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+DTYPES = {"float": np.float64, "int": np.int64, "bool": np.bool_, "category": np.int32}
+MISSING = {"float": np.nan, "int": 0, "bool": False, "category": -1}
+
+
+# Session-scoped column store for estimation rows. Each column is a
+# pre-allocated NumPy array that doubles when full, so appends are O(1)
+# amortized; text columns are stored as integer codes into a small list
+# of distinct values (Material, Idler Type, Company, labels...).
+class ColumnStore:
+    def __init__(self, schema, capacity=64):
+        self.schema = dict(schema)
+        self.version = 0
+        self._size = 0
+        self._capacity = capacity
+        self._data = {name: np.empty(capacity, dtype=DTYPES[kind]) for name, kind in self.schema.items()}
+        self._categories = {name: [] for name, kind in self.schema.items() if kind == "category"}
+        self._codes = {name: {} for name in self._categories}
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
+
+    @property
+    def columns(self):
+        return list(self.schema)
+
+    def _grow(self):
+        self._capacity *= 2
+        for name, values in self._data.items():
+            grown = np.empty(self._capacity, dtype=values.dtype)
+            grown[:self._size] = values[:self._size]
+            self._data[name] = grown
+
+    def _encode(self, name, value):
+        if value is None:
+            return -1
+        codes = self._codes[name]
+        if value not in codes:
+            codes[value] = len(self._categories[name])
+            self._categories[name].append(value)
+        return codes[value]
+
+    def append(self, row):
+        if self._size == self._capacity:
+            self._grow()
+        for name, kind in self.schema.items():
+            value = row.get(name)
+            if kind == "category":
+                value = self._encode(name, value)
+            elif value is None:
+                value = MISSING[kind]
+            self._data[name][self._size] = value
+        self._size += 1
+        self.version += 1
+
+    # DataFrame over the filled part of each array; numeric columns are not copied
+    def to_frame(self):
+        columns = {}
+        for name, kind in self.schema.items():
+            values = self._data[name][:self._size]
+            if kind == "category":
+                values = pd.Categorical.from_codes(values, categories=self._categories[name])
+            columns[name] = values
+        return pd.DataFrame(columns, copy=False)
+
+    # Plain dict rows, for writers that stream one row at a time
+    def __iter__(self):
+        lists = []
+        for name, kind in self.schema.items():
+            values = self._data[name][:self._size].tolist()
+            if kind == "category":
+                categories = self._categories[name]
+                values = [categories[code] if code >= 0 else None for code in values]
+            lists.append(values)
+        for values in zip(*lists):
+            yield dict(zip(self.schema, values))
+
+    # Bytes held by the filled rows, including the distinct category values
+    def nbytes(self):
+        total = sum(values[:self._size].nbytes for values in self._data.values())
+        for categories in self._categories.values():
+            total += sum(sys.getsizeof(value) for value in categories)
+        return total
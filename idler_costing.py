@@ -0,0 +1,264 @@
+import numpy as np
+import pandas as pd
+
+from cost_graph import CostGraph
+from profiling import timed
+
+# Densities in g/cm³
+MATERIAL_DENSITY = {
+    "Mild Steel": 7.85,
+    "Stainless Steel": 8.0
+}
+OVERHEAD_RATE = 0.10
+IDLER_TYPES = ["Carrying", "Return", "Impact"]
+DEFAULT_PROFIT_PCT = 15
+
+# Bought-out parts are priced per end, two ends per idler
+COMPONENT_COLUMNS = ["Bearing Cost", "Cup Cost", "Dust Cover Cost", "Seal Cost", "Circlip Cost"]
+CONVERSION_COLUMNS = ["Painting", "Welding", "Handling", "Pipe Machining", "Rod Machining",
+                      "Rod Milling", "Assembly", "Machining", "Testing"]
+SPEC_COLUMNS = ["Pipe OD", "Pipe Thickness", "Pipe Length", "Shaft Dia", "Shaft Length",
+                "Pipe Price", "Shaft Price"]
+RUBBER_COLUMNS = ["Rubber Rings", "Cost per Ring", "Fixing Charges"]
+# Every numeric input of a costing; the ones after SPEC_COLUMNS may be blank
+NUMBER_COLUMNS = SPEC_COLUMNS + COMPONENT_COLUMNS + CONVERSION_COLUMNS + RUBBER_COLUMNS + ["Profit Margin (%)"]
+# Above this many records pandas parses the fields faster than a Python loop
+RECORD_LOOP_LIMIT = 200
+# Problems listed in a rejected cost_records call before the rest are counted
+MAX_REPORTED_PROBLEMS = 20
+# Cost breakdown, same fields as an "Add to Estimation" entry
+BREAKDOWN_COLUMNS = ["Pipe Cost", "Shaft Cost", "Component Cost", "Rubber Cost", "Conversion Cost",
+                     "Overhead", "Profit", "Final Cost"]
+
+
+# Vectorized weight calculations (kg), work on scalars or arrays
+def pipe_weights(od, thickness, length, density):
+    od = np.asarray(od, dtype=float)
+    outer_radius = od / 2
+    inner_radius = outer_radius - np.asarray(thickness, dtype=float)
+    volume_mm3 = np.pi * (outer_radius**2 - inner_radius**2) * np.asarray(length, dtype=float)
+    volume_cm3 = volume_mm3 / 1000
+    return np.round((volume_cm3 * np.asarray(density, dtype=float)) / 1000, 2)
+
+def shaft_weights(dia, length, density):
+    radius = np.asarray(dia, dtype=float) / 2
+    volume_mm3 = np.pi * (radius**2) * np.asarray(length, dtype=float)
+    volume_cm3 = volume_mm3 / 1000
+    return np.round((volume_cm3 * np.asarray(density, dtype=float)) / 1000, 2)
+
+# Single idler wrappers, same numbers as the batch path
+def calc_pipe_weight(od, thickness, length, density):
+    return float(pipe_weights(od, thickness, length, density))
+
+def calc_shaft_weight(dia, length, density):
+    return float(shaft_weights(dia, length, density))
+
+# Base -> overhead -> profit -> final
+def cost_chain(base, profit_pct):
+    overhead = base * OVERHEAD_RATE
+    profit = (base + overhead) * (profit_pct / 100)
+    final = base + overhead + profit
+    return overhead, profit, final
+
+
+# dimensions -> weights -> material cost -> base -> overhead -> profit -> final
+# Inputs: pipe_od, pipe_thickness, pipe_length, shaft_dia, shaft_length, density,
+# pipe_price, shaft_price, component_cost, rubber_cost, conversion_cost, profit_pct
+def idler_cost_graph():
+    return CostGraph({
+        "pipe_weight": (("pipe_od", "pipe_thickness", "pipe_length", "density"), calc_pipe_weight),
+        "shaft_weight": (("shaft_dia", "shaft_length", "density"), calc_shaft_weight),
+        "pipe_cost": (("pipe_weight", "pipe_price"), lambda weight, price: weight * price),
+        "shaft_cost": (("shaft_weight", "shaft_price"), lambda weight, price: weight * price),
+        "base": (("pipe_cost", "shaft_cost", "component_cost", "rubber_cost", "conversion_cost"),
+                 lambda *costs: sum(costs)),
+        "overhead": (("base",), lambda base: base * OVERHEAD_RATE),
+        "profit": (("base", "overhead", "profit_pct"),
+                   lambda base, overhead, profit_pct: (base + overhead) * (profit_pct / 100)),
+        "final": (("base", "overhead", "profit"), lambda base, overhead, profit: base + overhead + profit)
+    })
+
+
+# Numeric columns of a BOM parsed once, text as NaN
+def _numbers(df):
+    return {name: pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=float)
+            for name in NUMBER_COLUMNS if name in df.columns}
+
+# Blank (None/NaN) -> default, anything that isn't a number -> NaN
+def _number(value, default):
+    if value is None:
+        return default
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return np.nan
+    return value if value == value else default
+
+def _densities(materials, densities=None):
+    densities = densities or MATERIAL_DENSITY
+    found = [densities.get(m) if isinstance(m, str) else None for m in materials]
+    unknown = sorted({str(m) for m, density in zip(materials, found) if density is None or density != density})
+    if unknown:
+        raise ValueError(f"Unknown material: {', '.join(unknown)}")
+    return np.array(found, dtype=float)
+
+
+# Cost breakdown columns; column(name, default) returns one float per idler
+def _breakdown(column, density, is_impact):
+    pipe_weight = pipe_weights(column("Pipe OD"), column("Pipe Thickness"), column("Pipe Length"), density)
+    shaft_weight = shaft_weights(column("Shaft Dia"), column("Shaft Length"), density)
+    pipe_cost = pipe_weight * column("Pipe Price")
+    shaft_cost = shaft_weight * column("Shaft Price")
+
+    component_cost = 2 * sum(column(c) for c in COMPONENT_COLUMNS)
+    conversion_cost = sum(column(c) for c in CONVERSION_COLUMNS)
+    # Rubber rings only apply to impact idlers
+    rubber_cost = np.where(is_impact, column("Rubber Rings") * column("Cost per Ring")
+                           + column("Fixing Charges"), 0.0)
+
+    base = pipe_cost + shaft_cost + component_cost + rubber_cost + conversion_cost
+    overhead, profit, final = cost_chain(base, column("Profit Margin (%)", DEFAULT_PROFIT_PCT))
+    costs = [pipe_cost, shaft_cost, component_cost, rubber_cost, conversion_cost, overhead, profit, final]
+    return {"Pipe Weight (kg)": pipe_weight, "Shaft Weight (kg)": shaft_weight,
+            **{name: np.round(cost, 2) for name, cost in zip(BREAKDOWN_COLUMNS, costs)}}
+
+# Which BOM rows can be costed, and why each of the others can't. Sizes and
+# prices must be positive numbers and the pipe wall thinner than its radius;
+# blank optional costs count as 0 but text in them is an error. Each check is
+# a mask, and reason text is only built for the rows that fail.
+def _bom_problems(df, numbers, density):
+    checks = []
+    for name in SPEC_COLUMNS:
+        values = numbers[name]
+        checks.append((~(np.isfinite(values) & (values > 0)), f"{name} must be a positive number"))
+    for name in NUMBER_COLUMNS[len(SPEC_COLUMNS):]:
+        if name in numbers:
+            values = numbers[name]
+            checks.append((df[name].notna().to_numpy() & np.isnan(values), f"{name} is not a number"))
+            checks.append((values < 0, f"negative {name}"))
+    checks.append((numbers["Pipe Thickness"] >= numbers["Pipe OD"] / 2,
+                   "Pipe Thickness must be less than half the Pipe OD"))
+    if "Density" in df.columns:
+        given = pd.to_numeric(df["Density"], errors="coerce").to_numpy(dtype=float)
+        checks.append((df["Density"].notna().to_numpy() & ~(given > 0), "Density must be a positive number"))
+    checks.append((density.isna().to_numpy(), "unknown material"))
+    checks.append((~df["Idler Type"].isin(IDLER_TYPES).to_numpy(), "unknown Idler Type"))
+    invalid = np.logical_or.reduce([mask for mask, _ in checks])
+    reasons = ["; ".join(reason for mask, reason in checks if mask[row]) for row in np.flatnonzero(invalid)]
+    return ~invalid, reasons
+
+# "Idler N: <reasons>" for each spec that can't be costed, same rules as
+# _bom_problems; values holds the parsed fields in names order, blanks already
+# defaulted and anything else that isn't a number as NaN
+def _record_problems(specs, values, names):
+    required = len(SPEC_COLUMNS)
+    od, thickness = values[:, names.index("Pipe OD")], values[:, names.index("Pipe Thickness")]
+    bad = ~np.isfinite(values) | (values < 0)
+    bad[:, :required] |= values[:, :required] <= 0
+    thick = thickness >= od / 2
+    text = np.array([not isinstance(spec.get("Material", "Mild Steel"), str) for spec in specs], dtype=bool)
+    kind = np.array([not isinstance(spec.get("Idler Type", "Carrying"), str)
+                     or spec.get("Idler Type", "Carrying") not in IDLER_TYPES for spec in specs], dtype=bool)
+    problems = []
+    for i in np.flatnonzero(bad.any(axis=1) | thick | text | kind):
+        reasons = [f"{name} must be a positive number" if j < required
+                   else f"{name} must be a number of at least 0"
+                   for j, name in enumerate(names) if bad[i, j]]
+        if thick[i]:
+            reasons.append("Pipe Thickness must be less than half the Pipe OD")
+        if text[i]:
+            reasons.append("Material must be a name")
+        if kind[i]:
+            reasons.append(f"Idler Type must be one of {', '.join(IDLER_TYPES)}")
+        problems.append(f"Idler {i + 1}: {', '.join(reasons)}")
+    return problems
+
+# Cost a whole BOM sheet in one pass. Returns (costed rows, rejected rows with
+# a reason); rows with missing or impossible inputs are never costed.
+# densities maps material -> g/cm³ (e.g. material_prices' as-of densities,
+# MATERIAL_DENSITY by default) for rows without a Density of their own.
+@timed()
+def cost_idlers(specs, densities=None):
+    df = specs.copy()
+    df.columns = df.columns.astype(str).str.strip()
+    missing = [c for c in SPEC_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"BOM is missing columns: {', '.join(missing)}")
+
+    if "Material" not in df.columns:
+        df["Material"] = "Mild Steel"
+    if "Idler Type" not in df.columns:
+        df["Idler Type"] = "Carrying"
+    # Looked up once per distinct material, not per row
+    codes, materials = pd.factorize(df["Material"])
+    lookup = np.array([(densities or MATERIAL_DENSITY).get(m, np.nan) for m in materials] + [np.nan], dtype=float)
+    density = pd.Series(lookup[codes], index=df.index)
+    # Densities in effect on the quote date (see material_prices.fill_bom_prices)
+    if "Density" in df.columns:
+        density = pd.to_numeric(df["Density"], errors="coerce").fillna(density)
+    numbers = _numbers(df)
+    valid, reasons = _bom_problems(df, numbers, density)
+    rows = np.flatnonzero(~valid)
+    rejected = specs.iloc[rows].assign(Row=rows + 2, Reason=reasons)
+
+    density = density.to_numpy(dtype=float)
+    if not valid.all():
+        df = df[valid].reset_index(drop=True)
+        density = density[valid]
+        numbers = {name: values[valid] for name, values in numbers.items()}
+    # Costed rows show the numbers they were costed with (a sheet column may
+    # mix typed text and filled-in prices)
+    for name in ["Pipe Price", "Shaft Price"]:
+        df[name] = numbers[name]
+    if "Density" in df.columns:
+        df["Density"] = density
+
+    def column(name, default=0.0):
+        if name not in numbers:
+            return np.full(len(df), default, dtype=float)
+        values = numbers[name]
+        return np.where(np.isnan(values), default, values)
+
+    is_impact = (df["Idler Type"] == "Impact").to_numpy()
+    for name, values in _breakdown(column, density, is_impact).items():
+        df[name] = values
+    return df, rejected
+
+# Same costing for a list of dicts (one per idler). Small lists skip the
+# DataFrame entirely: one idler takes ~0.15 ms here against ~10 ms through
+# cost_idlers. Returns one breakdown dict per spec; densities as for cost_idlers.
+# Raises ValueError naming every idler and field that can't be costed.
+def cost_records(specs, densities=None):
+    for i, spec in enumerate(specs):
+        missing = [c for c in SPEC_COLUMNS if c not in spec]
+        if missing:
+            raise ValueError(f"Idler {i + 1} is missing: {', '.join(missing)}")
+
+    # Every numeric field parsed in one pass into one (idlers x fields) array;
+    # a blank size or price is an error, a blank optional cost counts as 0
+    names = NUMBER_COLUMNS
+    defaults = [np.nan if name in SPEC_COLUMNS else DEFAULT_PROFIT_PCT if name == "Profit Margin (%)" else 0.0
+                for name in names]
+    if len(specs) > RECORD_LOOP_LIMIT:
+        frame = pd.DataFrame.from_records(specs, columns=names)
+        values = np.column_stack([pd.to_numeric(frame[name], errors="coerce").to_numpy(dtype=float)
+                                  for name in names])
+        blank = frame.isna().to_numpy()
+        values[blank] = np.broadcast_to(np.array(defaults, dtype=float), values.shape)[blank]
+    else:
+        values = np.array([[_number(spec.get(name), default) for name, default in zip(names, defaults)]
+                           for spec in specs], dtype=float).reshape(len(specs), len(names))
+    problems = _record_problems(specs, values, names)
+    if problems:
+        more = len(problems) - MAX_REPORTED_PROBLEMS
+        raise ValueError("; ".join(problems[:MAX_REPORTED_PROBLEMS]) + (f"; and {more} more" if more > 0 else ""))
+    density = _densities([spec.get("Material", "Mild Steel") for spec in specs], densities)
+    is_impact = np.array([spec.get("Idler Type", "Carrying") == "Impact" for spec in specs], dtype=bool)
+    positions = {name: i for i, name in enumerate(names)}
+
+    def column(name, default=0.0):
+        return values[:, positions[name]]
+
+    columns = _breakdown(column, density, is_impact)
+    fields = list(columns)
+    return [dict(zip(fields, row)) for row in zip(*(columns[field].tolist() for field in fields))]
@@ -0,0 +1,212 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from idler_neighbours import NeighbourIndex
+from profiling import span
+
+MASTER_FILE = "idler_master.xlsx"
+KEY_COLUMNS = ["Pipe OD", "Shaft Dia"]
+# Sizes closer than 0.01 mm are treated as the same catalogue key
+KEY_DECIMALS = 2
+
+_cache = {}
+_cache_lock = threading.RLock()
+
+
+def size_key(pipe_od, shaft_dia):
+    try:
+        return (round(float(pipe_od), KEY_DECIMALS), round(float(shaft_dia), KEY_DECIMALS))
+    except (TypeError, ValueError):
+        return None
+
+
+# Master sheet plus journalled entries, with a (Pipe OD, Shaft Dia) hash index
+class MasterCatalogue:
+    def __init__(self, df):
+        self.master_df = df.reset_index(drop=True)
+        self.pending = []
+        self.index = {}
+        self._df = self.master_df
+        self._neighbours = None
+        self._records = None
+        if not self.master_df.empty and all(c in self.master_df.columns for c in KEY_COLUMNS):
+            ods = pd.to_numeric(self.master_df["Pipe OD"], errors="coerce").round(KEY_DECIMALS)
+            dias = pd.to_numeric(self.master_df["Shaft Dia"], errors="coerce").round(KEY_DECIMALS)
+            # First row wins, same as the old boolean-mask match
+            for pos, key in enumerate(zip(ods.tolist(), dias.tolist())):
+                if not (np.isnan(key[0]) or np.isnan(key[1])):
+                    self.index.setdefault(key, pos)
+
+    def __len__(self):
+        return len(self.master_df) + len(self.pending)
+
+    # Master rows followed by journalled rows not yet compacted
+    @property
+    def df(self):
+        if self._df is None:
+            self._df = pd.concat([self.master_df, pd.DataFrame(self.pending)], ignore_index=True)
+        return self._df
+
+    def add(self, entry):
+        key = size_key(entry.get("Pipe OD"), entry.get("Shaft Dia"))
+        if key is None or key in self.index:
+            return False
+        self.index[key] = len(self)
+        self.pending.append(entry)
+        self._df = None
+        self._neighbours = None
+        return True
+
+    def position(self, pipe_od, shaft_dia):
+        return self.index.get(size_key(pipe_od, shaft_dia))
+
+    def lookup(self, pipe_od, shaft_dia):
+        pos = self.position(pipe_od, shaft_dia)
+        if pos is None:
+            return None
+        if pos < len(self.master_df):
+            return self.master_df.iloc[pos]
+        return pd.Series(self.pending[pos - len(self.master_df)])
+
+    # Matching row as a plain dict (read-only), far cheaper than a Series
+    # when a service looks up one size per request
+    def lookup_record(self, pipe_od, shaft_dia):
+        pos = self.position(pipe_od, shaft_dia)
+        if pos is None:
+            return None
+        if pos < len(self.master_df):
+            return self.records()[pos]
+        return self.pending[pos - len(self.master_df)]
+
+    def records(self):
+        if self._records is None:
+            self._records = self.master_df.to_dict("records")
+        return self._records
+
+    # One row per requested size, NaN where the size is not in the master
+    def lookup_many(self, pipe_ods, shaft_dias):
+        ods = np.round(np.asarray(pipe_ods, dtype=float), KEY_DECIMALS).tolist()
+        dias = np.round(np.asarray(shaft_dias, dtype=float), KEY_DECIMALS).tolist()
+        positions = [self.index.get(key, -1) for key in zip(ods, dias)]
+        found = self.df.reindex(positions)
+        found.index = range(len(positions))
+        found["Matched"] = [p >= 0 for p in positions]
+        return found
+
+    # Closest catalogue entries for an unseen size, with interpolated costs
+    def nearest(self, query, k=3):
+        if self._neighbours is None:
+            with span("build neighbour index"):
+                self._neighbours = NeighbourIndex(self.df)
+        return self._neighbours.estimate(query, k)
+
+
+def journal_path(path=MASTER_FILE):
+    return os.path.splitext(path)[0] + "_journal.jsonl"
+
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _read_master(path):
+    return pd.read_excel(path) if os.path.exists(path) else pd.DataFrame()
+
+
+def _read_journal(path, offset=0):
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return [], offset
+    # Ignore a half-written last line, it is picked up on the next read
+    end = data.rfind(b"\n") + 1
+    entries = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+    return entries, offset + end
+
+
+# Pick up entries other sessions/processes appended since the last read
+def _replay_journal(state, path):
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        size = 0
+    if size < state["offset"]:
+        # Journal was compacted by someone else; start over from the master rows
+        state["catalogue"] = MasterCatalogue(state["catalogue"].master_df)
+        state["offset"] = 0
+    if size > state["offset"]:
+        entries, state["offset"] = _read_journal(path, state["offset"])
+        for entry in entries:
+            state["catalogue"].add(entry)
+
+
+# Shared across sessions; the workbook is reparsed only when it changes on disk
+def get_catalogue(path=MASTER_FILE):
+    stamp = _file_stamp(path)
+    with _cache_lock:
+        state = _cache.get(path)
+        if state is None or state["stamp"] != stamp:
+            with span("load master"):
+                state = {"stamp": stamp, "catalogue": MasterCatalogue(_read_master(path)), "offset": 0}
+            _cache[path] = state
+        _replay_journal(state, journal_path(path))
+        return state["catalogue"]
+
+
+# O(1) append of a new catalogue entry; duplicates of a known size are skipped
+def append_entry(entry, path=MASTER_FILE):
+    with _cache_lock:
+        catalogue = get_catalogue(path)
+        if size_key(entry.get("Pipe OD"), entry.get("Shaft Dia")) in catalogue.index:
+            return False
+        line = json.dumps(entry) + "\n"
+        with open(journal_path(path), "a", encoding="utf-8") as f:
+            f.write(line)
+        _replay_journal(_cache[path], journal_path(path))
+        return True
+
+
+def pending_count(path=MASTER_FILE):
+    return len(get_catalogue(path).pending)
+
+
+# Fold the journal into the master workbook and start a fresh journal
+def compact(path=MASTER_FILE):
+    journal = journal_path(path)
+    compacting = journal + ".compacting"
+    with _cache_lock:
+        if os.path.exists(journal):
+            # New appends go to a fresh journal while this one is folded in
+            if os.path.exists(compacting):
+                with open(compacting, "ab") as dst, open(journal, "rb") as src:
+                    dst.write(src.read())
+                os.remove(journal)
+            else:
+                os.replace(journal, compacting)
+        entries, _ = _read_journal(compacting)
+        catalogue = MasterCatalogue(_read_master(path))
+        added = sum(catalogue.add(entry) for entry in entries)
+        if added:
+            tmp = path + ".tmp.xlsx"
+            with span("write master"):
+                catalogue.df.to_excel(tmp, index=False)
+            os.replace(tmp, path)
+        if os.path.exists(compacting):
+            os.remove(compacting)
+        _cache.pop(path, None)
+        return added
+
+
+def invalidate(path=MASTER_FILE):
+    with _cache_lock:
+        _cache.pop(path, None)
@@ -0,0 +1,134 @@
+import heapq
+
+import numpy as np
+import pandas as pd
+
+# Per-unit weight of each spec feature in the distance: 1 mm of OD or shaft
+# counts the same as 100 mm of length or a different material/idler type
+# being worth 5 mm of OD.
+NUMERIC_FEATURES = {"Pipe OD": 1.0, "Shaft Dia": 1.0, "Pipe Length": 0.01}
+CATEGORY_FEATURES = {"Material": 5.0, "Idler Type": 5.0}
+COST_COLUMNS = ["Bearing Cost", "Cup Cost", "Dust Cover Cost", "Seal Cost", "Circlip Cost",
+                "Painting", "Welding", "Handling", "Pipe Machining", "Rod Machining",
+                "Rod Milling", "Assembly", "Machining", "Testing"]
+LEAF_SIZE = 32
+
+
+# Exact k-nearest-neighbour search over catalogue specs with a KD-tree.
+# Each row becomes a point: weighted numeric features plus a one-hot block
+# per category scaled so that any two different values are CATEGORY_FEATURES
+# apart. Gaps in a numeric column are filled with the column median and an
+# unknown category sits halfway between all known ones.
+class NeighbourIndex:
+    def __init__(self, df):
+        self.df = df.reset_index(drop=True)
+        self.numeric = [name for name in NUMERIC_FEATURES if name in self.df.columns]
+        self.categories = {name: sorted(self.df[name].dropna().astype(str).unique())
+                           for name in CATEGORY_FEATURES if name in self.df.columns}
+        columns = []
+        for name in self.numeric:
+            values = pd.to_numeric(self.df[name], errors="coerce")
+            fill = values.median() if values.notna().any() else 0.0
+            columns.append(values.fillna(fill).to_numpy(dtype=float) * NUMERIC_FEATURES[name])
+        for name, vocabulary in self.categories.items():
+            codes = self.df[name].astype(str).to_numpy()
+            scale = CATEGORY_FEATURES[name] / np.sqrt(2)
+            for value in vocabulary:
+                columns.append((codes == value) * scale)
+        self.points = np.column_stack(columns) if columns and len(self.df) else np.empty((0, 0))
+        self.rows = np.arange(len(self.points))
+        self.nodes = []
+        if len(self.points):
+            self._build(0, len(self.points))
+
+    def __len__(self):
+        return len(self.points)
+
+    # Nodes are (dim, split, left, right) or (-1, start, stop) for a leaf
+    def _build(self, start, stop):
+        node_id = len(self.nodes)
+        if stop - start <= LEAF_SIZE:
+            self.nodes.append((-1, start, stop))
+            return node_id
+        self.nodes.append(None)
+        block = self.points[start:stop]
+        dim = int(np.argmax(block.max(axis=0) - block.min(axis=0)))
+        mid = (start + stop) // 2
+        order = np.argpartition(block[:, dim], mid - start)
+        self.points[start:stop] = block[order]
+        self.rows[start:stop] = self.rows[start:stop][order]
+        split = float(self.points[mid, dim])
+        left = self._build(start, mid)
+        right = self._build(mid, stop)
+        self.nodes[node_id] = (dim, split, left, right)
+        return node_id
+
+    def _point(self, query):
+        point = []
+        for name in self.numeric:
+            value = query.get(name)
+            if value is None or pd.isna(value):
+                # Fall back to the catalogue median for a missing spec
+                column = len(point)
+                point.append(float(np.median(self.points[:, column])))
+            else:
+                point.append(float(value) * NUMERIC_FEATURES[name])
+        for name, vocabulary in self.categories.items():
+            value = str(query.get(name))
+            scale = CATEGORY_FEATURES[name] / np.sqrt(2)
+            point.extend(scale if value == known else 0.0 for known in vocabulary)
+        return np.array(point)
+
+    # k closest catalogue rows as (row position, distance), nearest first
+    def search(self, query, k=3):
+        if not len(self.points):
+            return []
+        point = self._point(query)
+        best = []  # max-heap of (-squared distance, slot)
+        stack = [(0, 0.0)]
+        while stack:
+            node_id, plane = stack.pop()
+            if len(best) == k and plane >= -best[0][0]:
+                continue
+            node = self.nodes[node_id]
+            if node[0] == -1:
+                _, start, stop = node
+                dist = ((self.points[start:stop] - point) ** 2).sum(axis=1)
+                for offset in np.argsort(dist)[:k]:
+                    item = (-float(dist[offset]), start + int(offset))
+                    if len(best) < k:
+                        heapq.heappush(best, item)
+                    elif item[0] > best[0][0]:
+                        heapq.heapreplace(best, item)
+                continue
+            dim, split, left, right = node
+            gap = point[dim] - split
+            near, far = (left, right) if gap < 0 else (right, left)
+            # Far side first onto the stack so the near side is searched first
+            stack.append((far, max(plane, gap * gap)))
+            stack.append((near, plane))
+        found = sorted((-d, slot) for d, slot in best)
+        return [(int(self.rows[slot]), float(np.sqrt(d))) for d, slot in found]
+
+    # Neighbour rows with a Distance column, plus inverse-distance weighted costs
+    def estimate(self, query, k=3):
+        hits = self.search(query, k)
+        if not hits:
+            return pd.DataFrame(), {}
+        positions = [pos for pos, _ in hits]
+        distances = np.array([dist for _, dist in hits])
+        neighbours = self.df.iloc[positions].copy()
+        neighbours["Distance"] = np.round(distances, 3)
+
+        if distances[0] == 0:
+            weights = (distances == 0).astype(float)
+        else:
+            weights = 1 / distances
+        costs = {}
+        for name in COST_COLUMNS:
+            if name in neighbours.columns:
+                values = pd.to_numeric(neighbours[name], errors="coerce").to_numpy(dtype=float)
+                known = ~np.isnan(values)
+                if known.any() and weights[known].sum() > 0:
+                    costs[name] = float(np.average(values[known], weights=weights[known]))
+        return neighbours, costs
@@ -0,0 +1,159 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from idler_costing import (COMPONENT_COLUMNS, CONVERSION_COLUMNS, MATERIAL_DENSITY, OVERHEAD_RATE,
+                           pipe_weights, shaft_weights)
+from profiling import timed
+
+CHUNK_SIZE = 1_000_000
+
+
+# Lightest/cheapest trade-off: keep a design only if no other design is
+# both lighter (or equal) and cheaper. Returns positions into the inputs.
+def pareto_front(weights, costs):
+    order = np.lexsort((costs, weights))
+    sorted_costs = costs[order]
+    best_before = np.minimum.accumulate(np.concatenate([[np.inf], sorted_costs[:-1]]))
+    return order[sorted_costs < best_before]
+
+
+def _grid(*axes):
+    return [values.ravel() for values in np.meshgrid(*axes, indexing="ij")]
+
+
+# Front of one material. Pipe and shaft weight/cost are independent of each
+# other once the (Pipe OD, Shaft Dia) size is fixed, so a design on the
+# combined front must pair a pipe from that OD's pipe-only front with a shaft
+# from that diameter's shaft-only front. Only those pairs are costed, with the
+# size's bought-out + conversion cost added, chunk_size at a time, instead of
+# the full dimension grid.
+def _material_front(od, thickness, pipe_length, shaft_dia, shaft_length, density,
+                    pipe_price, shaft_price, size_costs, chunk_size):
+    pipes = {}
+    for value in od:
+        pipe_thickness, length = _grid(thickness, pipe_length)
+        valid = pipe_thickness < value / 2
+        pipe_thickness, length = pipe_thickness[valid], length[valid]
+        weight = pipe_weights(value, pipe_thickness, length, density)
+        keep = pareto_front(weight, weight * pipe_price)
+        pipes[value] = (pipe_thickness[keep], length[keep], weight[keep])
+
+    shafts = {}
+    for value in shaft_dia:
+        weight = shaft_weights(value, shaft_length, density)
+        keep = pareto_front(weight, weight * shaft_price)
+        shafts[value] = (shaft_length[keep], weight[keep])
+
+    parts = []
+    for pipe_od, (pipe_thickness, length, pw) in pipes.items():
+        for dia, (sl, sw) in shafts.items():
+            extra = size_costs.get((pipe_od, dia), 0.0)
+            rows = max(1, chunk_size // max(1, len(sw)))
+            for start in range(0, len(pw), rows):
+                chunk = pw[start:start + rows]
+                weight = (chunk[:, None] + sw[None, :]).ravel()
+                cost = (chunk[:, None] * pipe_price + sw[None, :] * shaft_price).ravel() + extra
+                keep = pareto_front(weight, cost)
+                pipe_pos, shaft_pos = np.divmod(keep, len(sw))
+                parts.append((np.full(len(keep), pipe_od), pipe_thickness[start:start + rows][pipe_pos],
+                              length[start:start + rows][pipe_pos], np.full(len(keep), dia), sl[shaft_pos],
+                              weight[keep], cost[keep]))
+    if not parts:
+        return pd.DataFrame()
+    columns = [np.concatenate(values) for values in zip(*parts)]
+    keep = pareto_front(columns[5], columns[6])
+    return pd.DataFrame(dict(zip(["Pipe OD", "Pipe Thickness", "Pipe Length", "Shaft Dia", "Shaft Length",
+                                  "Total Weight (kg)", "Material Cost"], [values[keep] for values in columns])))
+
+
+# Bought-out + conversion cost of every (Pipe OD, Shaft Dia) size from the
+# master catalogue, for sweep(size_costs=...). Sizes the catalogue doesn't
+# have cost default.
+def catalogue_size_costs(catalogue, pipe_ods, shaft_dias, default=0.0):
+    ods, dias = _grid(np.atleast_1d(np.asarray(pipe_ods, dtype=float)),
+                      np.atleast_1d(np.asarray(shaft_dias, dtype=float)))
+    found = catalogue.lookup_many(ods, dias)
+    parts = found.reindex(columns=COMPONENT_COLUMNS + CONVERSION_COLUMNS).apply(pd.to_numeric, errors="coerce").fillna(0.0)
+    cost = 2 * parts[COMPONENT_COLUMNS].sum(axis=1) + parts[CONVERSION_COLUMNS].sum(axis=1)
+    costs = np.where(found["Matched"], cost, default)
+    return dict(zip(zip(ods.tolist(), dias.tolist()), costs.tolist()))
+
+
+# Sweep every combination of the given dimensions, materials and margins and
+# return the Pareto front of total weight vs final cost for each margin,
+# without building the full grid. prices maps material -> (pipe ₹/kg, shaft ₹/kg);
+# densities maps material -> g/cm³ (MATERIAL_DENSITY by default); size_costs
+# maps (Pipe OD, Shaft Dia) -> bought-out + conversion cost of that size (see
+# catalogue_size_costs), so a lighter size with dearer parts can still make the
+# front; other_cost is the rest of the cost per idler (rubber rings etc.). With
+# workers > 1 each material is swept in its own process.
+@timed()
+def sweep(pipe_ods, thicknesses, pipe_lengths, shaft_dias, shaft_lengths, materials, margins,
+          prices, other_cost=0.0, workers=1, chunk_size=CHUNK_SIZE, densities=None, size_costs=None):
+    materials = list(materials)
+    axes = [np.atleast_1d(np.asarray(values, dtype=float)) for values in
+            (pipe_ods, thicknesses, pipe_lengths, shaft_dias, shaft_lengths)]
+    margins = np.atleast_1d(np.asarray(margins, dtype=float))
+    total = int(np.prod([len(axis) for axis in axes])) * len(materials) * len(margins)
+
+    densities = densities or MATERIAL_DENSITY
+    size_costs = size_costs or {}
+    args = [(*axes, densities[m], prices[m][0], prices[m][1], size_costs, chunk_size) for m in materials]
+    if workers > 1 and len(materials) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_material_front, *zip(*args)))
+    else:
+        parts = [_material_front(*material_args) for material_args in args]
+
+    fronts = []
+    for material, part in zip(materials, parts):
+        if not part.empty:
+            fronts.append(part.assign(Material=material))
+    if not fronts:
+        return pd.DataFrame(), total
+    front = pd.concat(fronts, ignore_index=True)
+    keep = pareto_front(front["Total Weight (kg)"].to_numpy(), front["Material Cost"].to_numpy())
+    front = front.iloc[keep]
+
+    # A margin scales every design's cost by the same factor, so the front is
+    # the same set of designs at each margin
+    base = front["Material Cost"].to_numpy() + other_cost
+    results = []
+    for margin in margins:
+        final = base * (1 + OVERHEAD_RATE) * (1 + margin / 100)
+        results.append(front.assign(**{"Profit Margin (%)": margin, "Final Cost": np.round(final, 2)}))
+    result = pd.concat(results, ignore_index=True).drop(columns="Material Cost")
+    result["Total Weight (kg)"] = result["Total Weight (kg)"].round(2)
+    return result, total
+
+
+# Brute-force check: cost every design of a small grid one at a time with the
+# scalar weight functions and compare its front with sweep()'s
+if __name__ == "__main__":
+    from itertools import product
+
+    from idler_costing import calc_pipe_weight, calc_shaft_weight
+
+    rng = np.random.default_rng(0)
+    axes = [[89, 102, 114], [3, 3.5, 4, 4.5, 5], [350, 380, 465], [20, 25, 30, 35], [400, 430, 515]]
+    prices = {"Mild Steel": (72.0, 65.0), "Stainless Steel": (240.0, 260.0)}
+    size_costs = {(float(od), float(dia)): float(rng.uniform(300, 900)) for od, dia in product(axes[0], axes[3])}
+    front, total = sweep(*axes, list(prices), [15], prices, other_cost=50.0, chunk_size=7, size_costs=size_costs)
+
+    designs = []
+    for material, (pipe_price, shaft_price) in prices.items():
+        density = MATERIAL_DENSITY[material]
+        for od, thickness, pipe_length, dia, shaft_length in product(*axes):
+            if thickness >= od / 2:
+                continue
+            pipe_weight = calc_pipe_weight(od, thickness, pipe_length, density)
+            shaft_weight = calc_shaft_weight(dia, shaft_length, density)
+            cost = pipe_weight * pipe_price + shaft_weight * shaft_price + size_costs[(od, dia)] + 50.0
+            designs.append((round(pipe_weight + shaft_weight, 2), round(cost * (1 + OVERHEAD_RATE) * 1.15, 2)))
+    expected = {d for d in designs
+                if not any(o[0] <= d[0] and o[1] <= d[1] and o != d for o in designs)}
+    found = set(zip(front["Total Weight (kg)"], front["Final Cost"]))
+    assert found == expected, (sorted(found ^ expected), len(found), len(expected))
+    print(f"{total} combinations, {len(expected)} designs on the front, sweep() matches the brute force")
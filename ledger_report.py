@@ -0,0 +1,68 @@
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from openpyxl import Workbook
+
+from ledger_store import DB_FILE, ROLLUP_HEADINGS, ROLLUPS, TABLES, iter_rows, month_version, rollup
+from profiling import timed
+
+# Built reports kept in memory, most recently used last
+MAX_CACHED_REPORTS = 16
+SHEETS = [("Salaries", "salaries"), ("Expenses", "expenses")]
+SUMMARY_SHEETS = [("Salary Summary", "salaries"), ("Expense Summary", "expenses")]
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+# Write-only workbook built straight into a buffer. Months are written one
+# after another and each is read from the ledger in batches, so memory stays
+# flat however many months are exported. Write-only mode keeps each sheet's
+# rows in a temp file until the save; a normal workbook saves through the
+# same temp files (openpyxl zips every sheet from a file) and also holds
+# every cell in memory first, so it would only cost more.
+@timed("build report")
+def _build(months, path):
+    wb = Workbook(write_only=True)
+    sheets = {}
+    for title, table in SHEETS:
+        sheets[title] = wb.create_sheet(title)
+        sheets[title].append(["ID"] + list(TABLES[table].values()))
+    for title, table in SUMMARY_SHEETS:
+        sheets[title] = wb.create_sheet(title)
+        sheets[title].append(list(ROLLUP_HEADINGS[ROLLUPS[table][0]].values()))
+    for month in months:
+        for title, table in SHEETS:
+            for row in iter_rows(table, path, month=month):
+                sheets[title].append(row)
+        for title, table in SUMMARY_SHEETS:
+            for row in rollup(table, path, month=month).itertuples(index=False):
+                sheets[title].append(list(row))
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+# Excel report for one or more months, shared by every session. The bytes are
+# rebuilt only when an entry in one of those months is added, edited or deleted.
+def report_bytes(months, path=DB_FILE):
+    months = (months,) if isinstance(months, str) else tuple(months)
+    key = (os.path.abspath(path), months, tuple(month_version(m, path) for m in months))
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    data = _build(months, path)
+    with _cache_lock:
+        _cache[key] = data
+        while len(_cache) > MAX_CACHED_REPORTS:
+            _cache.popitem(last=False)
+    return data
+
+
+def report_name(months):
+    months = [months] if isinstance(months, str) else sorted(months)
+    if len(months) == 1:
+        return f"Steadfast_Report_{months[0]}.xlsx"
+    return f"Steadfast_Report_{months[0]}_to_{months[-1]}.xlsx"
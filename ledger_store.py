@@ -0,0 +1,268 @@
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+from profiling import timed
+
+DB_FILE = "steadfast_ledger.db"
+
+# Table columns -> headings used on screen and in the Excel report
+SALARY_COLUMNS = {
+    "month": "Month",
+    "name": "Name",
+    "type": "Type",
+    "per_day": "Per Day",
+    "days_worked": "Days Worked",
+    "ot_hours": "OT Hours",
+    "advance": "Advance",
+    "total_amount": "Total Amount",
+    "net_amount": "Net Amount"
+}
+EXPENSE_COLUMNS = {
+    "month": "Month",
+    "vendor": "Vendor",
+    "category": "Category",
+    "amount": "Amount",
+    "date": "Date",
+    "remarks": "Remarks"
+}
+TABLES = {"salaries": SALARY_COLUMNS, "expenses": EXPENSE_COLUMNS}
+FILTERS = {"salaries": ("month", "name", "type"), "expenses": ("month", "category", "vendor")}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS salaries (
+    id INTEGER PRIMARY KEY,
+    month TEXT NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    per_day REAL NOT NULL DEFAULT 0,
+    days_worked REAL NOT NULL DEFAULT 0,
+    ot_hours REAL NOT NULL DEFAULT 0,
+    advance REAL NOT NULL DEFAULT 0,
+    total_amount REAL NOT NULL DEFAULT 0,
+    net_amount REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS salaries_month ON salaries (month, name);
+CREATE INDEX IF NOT EXISTS salaries_name ON salaries (name);
+CREATE TABLE IF NOT EXISTS expenses (
+    id INTEGER PRIMARY KEY,
+    month TEXT NOT NULL,
+    vendor TEXT NOT NULL,
+    category TEXT NOT NULL,
+    amount REAL NOT NULL DEFAULT 0,
+    date TEXT NOT NULL,
+    remarks TEXT
+);
+CREATE INDEX IF NOT EXISTS expenses_month ON expenses (month, category);
+CREATE INDEX IF NOT EXISTS expenses_category ON expenses (category);
+CREATE TABLE IF NOT EXISTS month_versions (
+    month TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+"""
+
+# Per month totals kept up to date by triggers, so adding, editing or
+# deleting an entry touches one rollup row instead of rescanning the month
+ROLLUPS = {
+    "salaries": ("salary_rollup", ("month", "name", "type"), ("total_amount", "advance", "net_amount")),
+    "expenses": ("expense_rollup", ("month", "category"), ("amount",))
+}
+ROLLUP_HEADINGS = {
+    "salary_rollup": {"month": "Month", "name": "Name", "type": "Type", "entries": "Entries",
+                      "total_amount": "Total Amount", "advance": "Advance", "net_amount": "Net Amount"},
+    "expense_rollup": {"month": "Month", "category": "Category", "entries": "Entries", "amount": "Amount"}
+}
+
+
+def _rollup_schema(table):
+    rollup, keys, sums = ROLLUPS[table]
+    key_list, sum_list = ", ".join(keys), ", ".join(sums)
+    match = lambda row: " AND ".join(f"{k} = {row}.{k}" for k in keys)
+    add = ", ".join(["entries = entries + 1"] + [f"{c} = {c} + excluded.{c}" for c in sums])
+    remove = ", ".join(["entries = entries - 1"] + [f"{c} = {c} - OLD.{c}" for c in sums])
+    insert_new = (f"INSERT INTO {rollup} ({key_list}, entries, {sum_list}) "
+                  f"VALUES ({', '.join('NEW.' + k for k in keys)}, 1, {', '.join('NEW.' + c for c in sums)}) "
+                  f"ON CONFLICT ({key_list}) DO UPDATE SET {add};")
+    remove_old = (f"UPDATE {rollup} SET {remove} WHERE {match('OLD')}; "
+                  f"DELETE FROM {rollup} WHERE {match('OLD')} AND entries = 0;")
+    return f"""
+CREATE TABLE IF NOT EXISTS {rollup} (
+    {', '.join(f'{k} TEXT NOT NULL' for k in keys)},
+    entries INTEGER NOT NULL DEFAULT 0,
+    {', '.join(f'{c} REAL NOT NULL DEFAULT 0' for c in sums)},
+    PRIMARY KEY ({key_list})
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS {table}_rollup_insert AFTER INSERT ON {table} BEGIN {insert_new} END;
+CREATE TRIGGER IF NOT EXISTS {table}_rollup_delete AFTER DELETE ON {table} BEGIN {remove_old} END;
+CREATE TRIGGER IF NOT EXISTS {table}_rollup_update AFTER UPDATE ON {table} BEGIN {remove_old} {insert_new} END;
+"""
+
+
+# Recount a rollup from its base table (for databases created before rollups existed)
+def rebuild_rollup(table, path=DB_FILE, conn=None):
+    rollup, keys, sums = ROLLUPS[table]
+    key_list = ", ".join(keys)
+    conn = conn or connect(path)
+    with conn:
+        conn.execute(f"DELETE FROM {rollup}")
+        conn.execute(f"INSERT INTO {rollup} ({key_list}, entries, {', '.join(sums)}) "
+                     f"SELECT {key_list}, COUNT(*), {', '.join(f'SUM({c})' for c in sums)} "
+                     f"FROM {table} GROUP BY {key_list}")
+
+# Rebuild any rollup whose entry count no longer matches its base table; run
+# once per database when it is first opened, or by hand after editing the
+# file outside the app. Returns the tables that were rebuilt.
+def check_rollups(path=DB_FILE, conn=None):
+    conn = conn or connect(path)
+    rebuilt = []
+    for table, (rollup, _, _) in ROLLUPS.items():
+        rolled = conn.execute(f"SELECT SUM(entries) FROM {rollup}").fetchone()[0] or 0
+        if rolled != conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]:
+            rebuild_rollup(table, conn=conn)
+            rebuilt.append(table)
+    return rebuilt
+
+
+_local = threading.local()
+# Databases whose schema has been set up by this process
+_ready = set()
+_ready_lock = threading.Lock()
+
+
+# WAL mode (stored in the file), tables, indexes and rollup triggers
+def _setup(conn):
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    for table in ROLLUPS:
+        conn.executescript(_rollup_schema(table))
+    check_rollups(conn=conn)
+
+
+# One connection per thread; WAL lets readers carry on while someone writes.
+# Streamlit runs each rerun on a new thread, so the schema is set up only by
+# the first connection to a database, later ones just open it.
+def connect(path=DB_FILE):
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    key = os.path.abspath(path)
+    if key not in connections:
+        conn = sqlite3.connect(path, timeout=10)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if key not in _ready:
+            with _ready_lock:
+                if key not in _ready:
+                    _setup(conn)
+                    _ready.add(key)
+        connections[key] = conn
+    return connections[key]
+
+
+# Bumped in the same transaction as every write, so anything built from a
+# month (e.g. a cached report) can tell whether it is still current
+def _touch(conn, months):
+    conn.executemany("INSERT INTO month_versions (month, version) VALUES (?, 1) "
+                     "ON CONFLICT (month) DO UPDATE SET version = version + 1", [(m,) for m in months])
+
+def month_version(month, path=DB_FILE):
+    row = connect(path).execute("SELECT version FROM month_versions WHERE month = ?", (month,)).fetchone()
+    return row[0] if row else 0
+
+
+def _insert(table, rows, path):
+    columns = list(TABLES[table])
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    conn = connect(path)
+    with conn:
+        conn.executemany(sql, ([row.get(c) for c in columns] for row in rows))
+        _touch(conn, {row.get("month") for row in rows})
+    return len(rows)
+
+# Bulk inserts in one transaction; rows use the table column names
+def add_salaries(rows, path=DB_FILE):
+    return _insert("salaries", rows, path)
+
+def add_expenses(rows, path=DB_FILE):
+    return _insert("expenses", rows, path)
+
+
+def _where(table, filters):
+    clauses, params = [], []
+    for name in FILTERS[table]:
+        if filters.get(name) is not None:
+            clauses.append(f"{name} = ?")
+            params.append(filters[name])
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+# One page of rows with on-screen headings, newest first
+@timed("ledger query")
+def query(table, limit=None, offset=0, path=DB_FILE, **filters):
+    where, params = _where(table, filters)
+    sql = f"SELECT id, {', '.join(TABLES[table])} FROM {table}{where} ORDER BY id DESC"
+    if limit is not None:
+        sql += " LIMIT ? OFFSET ?"
+        params += [limit, offset]
+    df = pd.read_sql_query(sql, connect(path), params=params)
+    return df.rename(columns={"id": "ID", **TABLES[table]})
+
+# Rows as plain tuples in entry order, fetched a batch at a time
+def iter_rows(table, path=DB_FILE, batch_size=5_000, **filters):
+    where, params = _where(table, filters)
+    cur = connect(path).execute(f"SELECT id, {', '.join(TABLES[table])} FROM {table}{where} ORDER BY id", params)
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+def count(table, path=DB_FILE, **filters):
+    where, params = _where(table, filters)
+    return connect(path).execute(f"SELECT COUNT(*) FROM {table}{where}", params).fetchone()[0]
+
+def months(path=DB_FILE):
+    sql = "SELECT month FROM salaries UNION SELECT month FROM expenses ORDER BY month DESC"
+    return [row[0] for row in connect(path).execute(sql)]
+
+
+def get_entry(table, entry_id, path=DB_FILE):
+    conn = connect(path)
+    row = conn.execute(f"SELECT {', '.join(TABLES[table])} FROM {table} WHERE id = ?", (entry_id,)).fetchone()
+    return dict(zip(TABLES[table], row)) if row else None
+
+
+# Change or remove a single entry by id; the triggers keep the rollups in step
+def update_entry(table, entry_id, path=DB_FILE, **values):
+    columns = [c for c in values if c in TABLES[table]]
+    if not columns:
+        return 0
+    conn = connect(path)
+    with conn:
+        old = conn.execute(f"SELECT month FROM {table} WHERE id = ?", (entry_id,)).fetchone()
+        cur = conn.execute(f"UPDATE {table} SET {', '.join(f'{c} = ?' for c in columns)} WHERE id = ?",
+                           [values[c] for c in columns] + [entry_id])
+        if old:
+            _touch(conn, {old[0], values.get("month", old[0])})
+    return cur.rowcount
+
+def delete_entry(table, entry_id, path=DB_FILE):
+    conn = connect(path)
+    with conn:
+        old = conn.execute(f"SELECT month FROM {table} WHERE id = ?", (entry_id,)).fetchone()
+        cur = conn.execute(f"DELETE FROM {table} WHERE id = ?", (entry_id,))
+        if old:
+            _touch(conn, {old[0]})
+    return cur.rowcount
+
+
+# Monthly totals per employee/type (salaries) or per category (expenses)
+@timed("ledger rollup")
+def rollup(table, path=DB_FILE, **filters):
+    name, keys, _ = ROLLUPS[table]
+    clauses = [f"{k} = ?" for k in keys if filters.get(k) is not None]
+    params = [filters[k] for k in keys if filters.get(k) is not None]
+    where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+    df = pd.read_sql_query(f"SELECT * FROM {name}{where} ORDER BY {', '.join(keys)}", connect(path), params=params)
+    return df.rename(columns=ROLLUP_HEADINGS[name])
@@ -0,0 +1,191 @@
+import csv
+import os
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from idler_costing import MATERIAL_DENSITY
+from profiling import span
+
+PRICE_FILE = "material_prices.csv"
+COLUMNS = ["Material", "Grade", "Effective Date", "Price (₹/kg)", "Density (g/cm³)"]
+# Densities in effect before anything is recorded
+BASE_DATE = date(2000, 1, 1)
+EPOCH = date(1970, 1, 1)
+
+_cache = {}
+_cache_lock = threading.RLock()
+
+
+def _days(values):
+    return pd.to_datetime(pd.Series(values)).to_numpy().astype("datetime64[D]").astype(np.int64)
+
+# Days since 1970-01-01, the unit the indexes are sorted on
+def _day(value):
+    value = pd.Timestamp(value).date() if value is not None else date.today()
+    return (value - EPOCH).days
+
+def _number(value):
+    return None if value is None or np.isnan(value) else float(value)
+
+
+# Price and density history, indexed per (material, grade); entries without a
+# grade apply to every grade of the material that has none of its own. Each
+# index is sorted by effective date with the last known price and density
+# carried forward, so an as-of lookup is one binary search and a batch of
+# dates is one searchsorted call per material and grade. Entries with the
+# same date: the one recorded last wins.
+class PriceHistory:
+    def __init__(self, df):
+        base = pd.DataFrame([{"Material": material, "Grade": "", "Effective Date": BASE_DATE,
+                              "Price (₹/kg)": np.nan, "Density (g/cm³)": density}
+                             for material, density in MATERIAL_DENSITY.items()])
+        df = pd.concat([base, df[COLUMNS]], ignore_index=True) if len(df) else base
+        df["Grade"] = df["Grade"].fillna("").astype(str).str.strip()
+        df["Material"] = df["Material"].astype(str).str.strip()
+        df["Effective Date"] = pd.to_datetime(df["Effective Date"]).dt.date
+        for column in ["Price (₹/kg)", "Density (g/cm³)"]:
+            df[column] = pd.to_numeric(df[column], errors="coerce")
+        df["day"] = _days(df["Effective Date"])
+        self.df = df.sort_values(["Material", "day"], kind="stable").reset_index(drop=True)
+        self.index = {}
+        self._densities = (None, None)
+        for key, rows in self.df.groupby(["Material", "Grade"], sort=False):
+            self.index[key] = (rows["day"].to_numpy(),
+                               rows["Price (₹/kg)"].ffill().to_numpy(dtype=float),
+                               rows["Density (g/cm³)"].ffill().to_numpy(dtype=float))
+
+    def materials(self):
+        return sorted({material for material, _ in self.index})
+
+    def grades(self, material):
+        return sorted(grade for m, grade in self.index if m == material and grade)
+
+    # Price and density in effect on each day for one (material, grade) key
+    def _search(self, key, days):
+        if key not in self.index:
+            return np.full(len(days), np.nan), np.full(len(days), np.nan)
+        index_days, prices, densities = self.index[key]
+        pos = np.searchsorted(index_days, days, side="right") - 1
+        valid = pos >= 0
+        pos = np.where(valid, pos, 0)
+        return np.where(valid, prices[pos], np.nan), np.where(valid, densities[pos], np.nan)
+
+    # A grade's own price and density where it has them, the material's otherwise
+    def _resolve(self, material, grade, days):
+        price, density = self._search((material, ""), days)
+        if grade:
+            grade_price, grade_density = self._search((material, grade), days)
+            price = np.where(np.isnan(grade_price), price, grade_price)
+            density = np.where(np.isnan(grade_density), density, grade_density)
+        return price, density
+
+    # Price and density in effect on a date (today by default); None for
+    # whichever has not been recorded yet
+    def lookup(self, material, grade=None, on=None):
+        price, density = self._resolve(material, grade, np.array([_day(on)]))
+        return {"Price": _number(price[0]), "Density": _number(density[0])}
+
+    # Material -> density in effect on a date (today by default), the
+    # densities argument of idler_costing.cost_records/cost_idlers. The last
+    # date asked for is kept, so repeated quotes for today cost one dict lookup.
+    def densities(self, on=None):
+        day = _day(on)
+        if self._densities[0] != day:
+            days = np.array([day])
+            self._densities = (day, {material: float(self._resolve(material, None, days)[1][0])
+                                     for material in self.materials()})
+        return self._densities[1]
+
+    # Vectorized as-of join: Price and Density for each (material, grade, date)
+    # row, NaN where nothing was in effect. grades may be None (no grade).
+    def as_of(self, materials, dates, grades=None):
+        n = len(materials)
+        keys = pd.DataFrame({
+            "Material": pd.Series(materials, dtype=object).astype(str).str.strip().to_numpy(),
+            "Grade": (pd.Series(grades, dtype=object).fillna("").astype(str).str.strip().to_numpy()
+                      if grades is not None else np.full(n, "", dtype=object))
+        })
+        days = _days(dates) if n else np.empty(0, dtype=np.int64)
+        price = np.full(n, np.nan)
+        density = np.full(n, np.nan)
+        for (material, grade), positions in keys.groupby(["Material", "Grade"], sort=False).indices.items():
+            price[positions], density[positions] = self._resolve(material, grade, days[positions])
+        return pd.DataFrame({"Price": price, "Density": density})
+
+    # Recorded entries, newest first (the built-in base densities left out)
+    def history(self, material=None):
+        df = self.df[self.df["Effective Date"] > BASE_DATE]
+        if material:
+            df = df[df["Material"] == material]
+        return df[COLUMNS].iloc[::-1].reset_index(drop=True)
+
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+# Shared across sessions; the CSV is reread only when it changes on disk
+def get_price_history(path=PRICE_FILE):
+    stamp = _file_stamp(path)
+    with _cache_lock:
+        state = _cache.get(path)
+        if state is None or state["stamp"] != stamp:
+            with span("load material prices"):
+                df = pd.read_csv(path, dtype={"Grade": str}) if stamp else pd.DataFrame(columns=COLUMNS)
+                state = _cache[path] = {"stamp": stamp, "history": PriceHistory(df)}
+        return state["history"]
+
+
+# Record a price and/or density taking effect on a date (one appended CSV line)
+def add_price(material, grade, effective, price=None, density=None, path=PRICE_FILE):
+    material = str(material).strip()
+    if not material:
+        raise ValueError("Material is required")
+    if not price and not density:
+        raise ValueError("Give a price, a density or both")
+    with _cache_lock:
+        if not density and material not in get_price_history(path).materials():
+            raise ValueError(f"{material} is a new material, give its density too")
+        new_file = not os.path.exists(path)
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(COLUMNS)
+            writer.writerow([material, (grade or "").strip(), pd.Timestamp(effective).date().isoformat(),
+                             price or "", density or ""])
+        _cache.pop(path, None)
+
+
+# Fill a BOM's blank Pipe/Shaft Price cells and its densities from the prices in
+# effect on each row's "Quote Date" (today when there is none). Optional
+# "Pipe Grade"/"Shaft Grade" columns pick a grade. Anything typed into the
+# sheet is kept as it is, typos too, so cost_idlers rejects those rows.
+def fill_bom_prices(bom, path=PRICE_FILE):
+    df = bom.copy()
+    df.columns = df.columns.astype(str).str.strip()
+    if not len(df):
+        return df
+    history = get_price_history(path)
+    materials = df["Material"] if "Material" in df.columns else pd.Series("Mild Steel", index=df.index)
+    dates = (pd.to_datetime(df["Quote Date"], errors="coerce").fillna(pd.Timestamp(date.today()))
+             if "Quote Date" in df.columns else [date.today()] * len(df))
+    for part in ["Pipe", "Shaft"]:
+        grades = df[f"{part} Grade"] if f"{part} Grade" in df.columns else None
+        found = history.as_of(materials.to_numpy(), dates, grades)
+        df[f"{part} Price"] = _fill_blanks(df, f"{part} Price", found["Price"].to_numpy())
+        if part == "Pipe":
+            df["Density"] = _fill_blanks(df, "Density", found["Density"].to_numpy())
+    return df
+
+def _fill_blanks(df, column, values):
+    if column not in df.columns:
+        return values
+    given = df[column].astype(object)
+    return given.where(given.notna(), pd.Series(values, index=df.index, dtype=object))
@@ -0,0 +1,105 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from ledger_store import DB_FILE, add_salaries
+from profiling import timed
+
+SALARY_TYPES = ["Daily Wage", "Fixed Salary"]
+OT_HOURS_PER_DAY = 8
+# Register headings (matched case-insensitively) -> ledger columns
+REGISTER_COLUMNS = {
+    "name": "name",
+    "type": "type",
+    "per day": "per_day",
+    "fixed salary": "fixed_salary",
+    "days worked": "days_worked",
+    "ot hours": "ot_hours",
+    "advance": "advance"
+}
+NUMERIC_COLUMNS = ["per_day", "fixed_salary", "days_worked", "ot_hours", "advance"]
+# The fields each salary type is paid on; the others are ignored, not checked
+TYPE_COLUMNS = {
+    "Daily Wage": ["per_day", "days_worked", "ot_hours", "advance"],
+    "Fixed Salary": ["fixed_salary", "advance"]
+}
+# Pay rates have to be filled in for the salary type that uses them; a blank
+# in any other field counts as 0
+RATE_COLUMNS = ["per_day", "fixed_salary"]
+LEDGER_COLUMNS = ["month", "name", "type", "per_day", "days_worked", "ot_hours", "advance",
+                  "total_amount", "net_amount"]
+
+
+# Whole attendance/OT register in one vectorized pass, same rules as the
+# single-entry form. Returns (ledger rows, rejected rows with a reason).
+@timed()
+def compute_payroll(register, month):
+    df = register.copy()
+    df.columns = df.columns.astype(str).str.strip().str.lower()
+    df = df.rename(columns=REGISTER_COLUMNS)
+    if "type" not in df.columns:
+        df["type"] = "Daily Wage"
+    blank = {}
+    for name in NUMERIC_COLUMNS:
+        raw = df[name] if name in df.columns else pd.Series(np.nan, index=df.index)
+        df[name] = pd.to_numeric(raw, errors="coerce")
+        blank[name] = raw.isna()
+        df.loc[blank[name], name] = 0.0
+    df["name"] = df["name"].fillna("").astype(str).str.strip() if "name" in df.columns else ""
+    df["type"] = df["type"].fillna("").astype(str).str.strip().str.title()
+
+    reasons = pd.Series("", index=df.index)
+    reasons[df["name"] == ""] += "missing name; "
+    reasons[~df["type"].isin(SALARY_TYPES)] += "unknown salary type; "
+    for name in NUMERIC_COLUMNS:
+        used = df["type"].isin([kind for kind, columns in TYPE_COLUMNS.items() if name in columns])
+        if name in RATE_COLUMNS:
+            reasons[used & blank[name]] += f"missing {name.replace('_', ' ')}; "
+        reasons[used & df[name].isna()] += f"{name.replace('_', ' ')} is not a number; "
+        reasons[used & (df[name] < 0)] += f"negative {name.replace('_', ' ')}; "
+    valid = reasons == ""
+
+    daily = (df["type"] == "Daily Wage").to_numpy()
+    # Fixed salaries ignore per-day rate, days and OT, as in the form
+    for name in ["per_day", "days_worked", "ot_hours"]:
+        df[name] = np.where(daily, df[name], 0.0)
+    total_days = df["days_worked"] + df["ot_hours"] / OT_HOURS_PER_DAY
+    df["total_amount"] = np.where(daily, df["per_day"] * total_days, df["fixed_salary"])
+    df["net_amount"] = df["total_amount"] - df["advance"]
+    df["month"] = month
+
+    rejected = register[~valid].assign(Row=df.index[~valid] + 2, Reason=reasons[~valid].str.rstrip("; "))
+    return df.loc[valid, LEDGER_COLUMNS].reset_index(drop=True), rejected
+
+
+@timed()
+def post_payroll(rows, path=DB_FILE):
+    return add_salaries(rows.to_dict("records"), path)
+
+
+# python payroll.py [rows]: throughput of compute + ledger insert on a synthetic register
+if __name__ == "__main__":
+    import os
+    import sys
+    import tempfile
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = np.random.default_rng(0)
+    register = pd.DataFrame({
+        "Name": [f"Worker {i}" for i in range(n)],
+        "Type": rng.choice(SALARY_TYPES, n, p=[0.8, 0.2]),
+        "Per Day": rng.uniform(400, 900, n).round(),
+        "Fixed Salary": rng.uniform(15000, 40000, n).round(),
+        "Days Worked": rng.integers(0, 27, n),
+        "OT Hours": rng.integers(0, 40, n),
+        "Advance": rng.choice([0, 500, 1000], n)
+    })
+    start = time.perf_counter()
+    rows, rejected = compute_payroll(register, "2025-01")
+    computed = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        post_payroll(rows, os.path.join(tmp, "ledger.db"))
+    posted = time.perf_counter()
+    print(f"{n} rows: compute {computed - start:.3f}s ({n / (computed - start):,.0f} rows/s), "
+          f"compute + insert {posted - start:.3f}s ({n / (posted - start):,.0f} rows/s)")
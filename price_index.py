@@ -0,0 +1,168 @@
+import bisect
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from profiling import span, timed
+from sheet_cache import load_table
+
+# Parsed workbooks kept in memory, most recently used last
+MAX_CACHED_FILES = 8
+BULK_COLUMNS = ["length inch", "moq", "final price"]
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def normalize_size(value):
+    return re.sub(r"\s+", " ", str(value).strip().lower())
+
+
+def _deletes(key):
+    return {key[:i] + key[i + 1:] for i in range(len(key))}
+
+
+# True when b is a one-character typo, insertion, deletion or swap of a
+def within_one_edit(a, b):
+    if abs(len(a) - len(b)) > 1:
+        return False
+    i = 0
+    while i < min(len(a), len(b)) and a[i] == b[i]:
+        i += 1
+    if len(a) > len(b):
+        return a[i + 1:] == b[i:]
+    if len(a) < len(b):
+        return a[i:] == b[i + 1:]
+    return (a[i + 1:] == b[i + 1:]
+            or (a[i:i + 2] == b[i:i + 2][::-1] and a[i + 2:] == b[i + 2:]))
+
+
+# Every sheet of a price list indexed by normalized size. The sheets are
+# stacked into one table (with a 'sheet' column) and each size maps to its row
+# positions in it; a sorted key list serves prefix searches and a one-delete
+# table (symmetric delete) serves typo-tolerant searches. The table may be a
+# DataFrame or a memory-mapped Arrow table; only its size column is read in
+# full, other cells are converted for the rows a lookup returns.
+class PriceIndex:
+    def __init__(self, table):
+        sizes = table["size"] if isinstance(table, pd.DataFrame) else table.column("size").to_pandas()
+        sizes = sizes.astype(str).str.strip().str.lower().str.replace(r"\s+", " ", regex=True)
+        if isinstance(table, pd.DataFrame):
+            table = table.reset_index(drop=True)
+            table["size"] = sizes.to_numpy()
+            self.columns = list(table.columns)
+        else:
+            self.columns = table.column_names
+        self.table = table
+        self.size_values = sizes.to_numpy(dtype=object)
+        self.sizes = pd.DataFrame({"size": sizes, "row": np.arange(len(sizes))})
+        self.positions = self.sizes.groupby("size", sort=False).indices if len(sizes) else {}
+        self.keys = sorted(self.positions)
+        self._delete_table = None
+
+    # Built from whole sheets already in memory (e.g. pd.read_excel(sheet_name=None))
+    @classmethod
+    def from_sheets(cls, sheets):
+        parts = []
+        for name, df in sheets.items():
+            df = df.copy()
+            df.columns = df.columns.astype(str).str.strip().str.lower()
+            if "size" in df.columns:
+                parts.append(df.assign(sheet=name))
+        return cls(pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=["size", "sheet"]))
+
+    # Built on the first fuzzy search, exact/prefix lookups don't need it
+    @property
+    def deletes(self):
+        if self._delete_table is None:
+            table = {}
+            for key in self.keys:
+                for variant in _deletes(key):
+                    table.setdefault(variant, []).append(key)
+            self._delete_table = table
+        return self._delete_table
+
+    def __len__(self):
+        return len(self.sizes)
+
+    # The given rows as a DataFrame, sizes normalized
+    def _take(self, rows, columns):
+        if isinstance(self.table, pd.DataFrame):
+            df = self.table.iloc[rows]
+            return (df if columns == self.columns else df[columns]).reset_index(drop=True)
+        df = self.table.select(columns).take(rows).to_pandas()
+        if "size" in columns:
+            df["size"] = self.size_values[rows]
+        return df
+
+    def rows(self, size):
+        hits = self.positions.get(normalize_size(size))
+        if hits is None:
+            return pd.DataFrame()
+        return self._take(hits, self.columns)
+
+    # Resolve many specs in one join: one output row per matching price row
+    # (so duplicates all show up) and a single unmatched row per missing spec
+    @timed()
+    def lookup_many(self, specs, columns=BULK_COLUMNS):
+        requested = pd.DataFrame({"line": range(1, len(specs) + 1), "spec": list(specs)})
+        requested["size"] = [normalize_size(spec) for spec in requested["spec"]]
+        keep = ["sheet"] + [c for c in columns if c in self.columns]
+        result = requested.merge(self.sizes, on="size", how="left", indicator="found")
+        result["found"] = result["found"] == "both"
+        values = self._take(result.loc[result["found"], "row"].to_numpy(dtype=np.int64), keep)
+        values.index = result.index[result["found"]]
+        result = result.join(values)[["line", "spec", "size"] + keep + ["found"]]
+        if "final price" in result.columns:
+            result["final price"] = pd.to_numeric(result["final price"], errors="coerce").round(2)
+        return result.drop(columns="size")
+
+    def exact(self, size):
+        return normalize_size(size) in self.positions
+
+    def prefix(self, text, limit=10):
+        text = normalize_size(text)
+        start = bisect.bisect_left(self.keys, text)
+        found = []
+        for key in self.keys[start:start + limit]:
+            if not key.startswith(text):
+                break
+            found.append(key)
+        return found
+
+    # Sizes within one edit (typo, missing/extra character, swapped pair)
+    def fuzzy(self, text, limit=10):
+        text = normalize_size(text)
+        deletes = self.deletes
+        candidates = set(deletes.get(text, []))
+        for variant in _deletes(text) | {text}:
+            if variant in self.positions:
+                candidates.add(variant)
+            candidates.update(deletes.get(variant, []))
+        return sorted(key for key in candidates if within_one_edit(text, key))[:limit]
+
+
+def file_hash(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+# One index per distinct uploaded file, shared by every session. The sheet is
+# streamed into an on-disk columnar cache once, so a restart skips the parse.
+# Pass the file's hash as key when it is already known, so a rerun doesn't
+# hash the whole upload again.
+def get_price_index(data, key=None):
+    key = key or file_hash(data)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    with span("build price index"):
+        index = PriceIndex(load_table(data))
+    with _cache_lock:
+        _cache[key] = index
+        while len(_cache) > MAX_CACHED_FILES:
+            _cache.popitem(last=False)
+    return index
@@ -0,0 +1,106 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+TRACE_FILE = "profile_trace.jsonl"
+# STEADFAST_PROFILE=1 turns profiling on for every session by default
+DEFAULT_ON = os.environ.get("STEADFAST_PROFILE", "") not in ("", "0")
+
+_local = threading.local()
+_trace_lock = threading.Lock()
+
+
+# Spans recorded on one thread between start_run and finish_run (one
+# Streamlit rerun). Code on other threads is not recorded.
+class Run:
+    def __init__(self, app, trace=False):
+        self.app = app
+        self.trace = trace
+        self.spans = []
+        self.depth = 0
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.total_ms = None
+
+    # Spans in start order, nested ones indented under their parent
+    def rows(self):
+        return [{
+            "Span": "  " * s["depth"] + s["name"],
+            "ms": round(s["ms"], 2),
+            "Blocks Δ": s["blocks"]
+        } for s in sorted(self.spans, key=lambda s: (s["at_ms"], s["depth"]))]
+
+
+# Times a block when the current thread is recording, otherwise does nothing
+# beyond one thread-local lookup. blocks is the change in the number of
+# memory blocks Python has allocated (sys.getallocatedblocks) across the span.
+class span:
+    __slots__ = ("name", "run", "start", "blocks")
+
+    def __init__(self, name):
+        self.name = name
+        self.run = getattr(_local, "run", None)
+
+    def __enter__(self):
+        run = self.run
+        if run is not None:
+            run.depth += 1
+            self.blocks = sys.getallocatedblocks()
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        run = self.run
+        if run is not None:
+            end = time.perf_counter()
+            run.depth -= 1
+            run.spans.append({
+                "name": self.name,
+                "at_ms": (self.start - run._start) * 1000,
+                "ms": (end - self.start) * 1000,
+                "blocks": sys.getallocatedblocks() - self.blocks,
+                "depth": run.depth
+            })
+        return False
+
+
+# Decorator form of span, named after the function unless a name is given
+def timed(name=None):
+    def decorate(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def start_run(app, trace=False):
+    run = Run(app, trace)
+    _local.run = run
+    return run
+
+def stop_run():
+    _local.run = None
+
+def finish_run(run, path=TRACE_FILE):
+    if getattr(_local, "run", None) is run:
+        _local.run = None
+    run.total_ms = (time.perf_counter() - run._start) * 1000
+    if run.trace:
+        write_trace(run, path)
+    return run
+
+
+# One JSON line per span, tagged with the app and when the run started
+def write_trace(run, path=TRACE_FILE):
+    lines = [json.dumps({"app": run.app, "run": run.started, **s}) + "\n" for s in run.spans]
+    lines.append(json.dumps({"app": run.app, "run": run.started, "name": "total", "at_ms": 0.0,
+                             "ms": run.total_ms, "blocks": None, "depth": -1}) + "\n")
+    with _trace_lock, open(path, "a", encoding="utf-8") as f:
+        f.writelines(lines)
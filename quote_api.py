@@ -0,0 +1,267 @@
+import argparse
+import gc
+import http.client
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from idler_costing import BREAKDOWN_COLUMNS, COMPONENT_COLUMNS, CONVERSION_COLUMNS, cost_records
+from idler_master import MASTER_FILE, get_catalogue
+from material_prices import PRICE_FILE, get_price_history
+
+# Headless idler quotes for the ERP: `python quote_api.py --workers 4`
+#   POST /quote   one idler spec (JSON object)        -> one quote
+#   POST /quotes  {"quotes": [spec, ...]} or a list   -> {"quotes": [quote, ...]}
+#   GET  /health
+# A spec uses the BOM sheet's column names ("Pipe OD", "Pipe Thickness", ...,
+# "Material", "Idler Type"). Bought-out and conversion costs left out of a
+# spec are taken from the master catalogue for that size, as with "Use RAG"
+# in the estimator; send "Use Catalogue": false to cost only what was sent.
+# Densities are today's from the material price history, so a material
+# recorded there (e.g. EN8) can be quoted like the built-in ones.
+HOST = "127.0.0.1"
+PORT = 8502
+WORKERS = os.cpu_count() or 1
+MAX_BATCH = 10_000
+MAX_BODY_BYTES = 16 * 2**20
+CATALOGUE_COLUMNS = COMPONENT_COLUMNS + CONVERSION_COLUMNS
+# What --load-test has to reach for single-idler quotes on one machine
+LOAD_TEST_TARGET = 2_000
+
+
+def quote_label(spec):
+    return (f"{spec.get('Pipe OD')}mmOD x {spec.get('Pipe Length')}LG "
+            f"{spec.get('Idler Type', 'Carrying')} Idler ({spec.get('Material', 'Mild Steel')})")
+
+
+# Spec fields win; the catalogue only fills costs the spec leaves out
+def _with_catalogue(spec, catalogue):
+    if catalogue is None or not spec.get("Use Catalogue", True):
+        return spec, False
+    match = catalogue.lookup_record(spec.get("Pipe OD"), spec.get("Shaft Dia"))
+    if match is None:
+        return spec, False
+    filled = {name: match[name] for name in CATALOGUE_COLUMNS if name in match and name not in spec}
+    return {**filled, **spec}, True
+
+
+# Same breakdown as an "Add to Estimation" entry, plus whether the size was
+# found in the catalogue
+def quote_many(specs, path=MASTER_FILE, prices=PRICE_FILE):
+    if not isinstance(specs, list) or not all(isinstance(spec, dict) for spec in specs):
+        raise ValueError("Expected a list of idler specs (JSON objects)")
+    if len(specs) > MAX_BATCH:
+        raise ValueError(f"At most {MAX_BATCH:,} idlers per request")
+    catalogue = get_catalogue(path) if path else None
+    filled = [_with_catalogue(spec, catalogue) for spec in specs]
+    costs = cost_records([spec for spec, _ in filled], get_price_history(prices).densities())
+    return [{
+        "Label": quote_label(spec),
+        **{name: cost[name] for name in BREAKDOWN_COLUMNS},
+        "Catalogue Match": matched
+    } for (spec, matched), cost in zip(filled, costs)]
+
+def quote(spec, path=MASTER_FILE, prices=PRICE_FILE):
+    if not isinstance(spec, dict):
+        raise ValueError("Expected an idler spec (JSON object)")
+    return quote_many([spec], path, prices)[0]
+
+
+class QuoteHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so an ERP client reuses one connection for many quotes. Headers
+    # and body go out as two writes; without TCP_NODELAY the second waits on
+    # the client's delayed ACK (~40 ms per quote).
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self._reply(404, {"error": f"Unknown path {self.path}"})
+        self._reply(200, {"status": "ok", "pid": os.getpid(),
+                          "catalogue_entries": len(get_catalogue(self.server.master_path))})
+
+    def do_POST(self):
+        if self.path not in ("/quote", "/quotes"):
+            return self._reply(404, {"error": f"Unknown path {self.path}"})
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            return self._reply(413, {"error": "Request body too large"})
+        try:
+            body = json.loads(self.rfile.read(length))
+            if self.path == "/quote":
+                return self._reply(200, quote(body, self.server.master_path, self.server.price_path))
+            specs = body.get("quotes") if isinstance(body, dict) else body
+            self._reply(200, {"quotes": quote_many(specs, self.server.master_path, self.server.price_path)})
+        except (TypeError, ValueError) as e:
+            # Malformed JSON, wrong shapes or fields that can't be costed
+            self._reply(400, {"error": str(e)})
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class QuoteServer(ThreadingHTTPServer):
+    def __init__(self, address, master_path=MASTER_FILE, price_path=PRICE_FILE):
+        self.master_path = master_path
+        self.price_path = price_path
+        super().__init__(address, QuoteHandler)
+
+
+# The catalogue is loaded once here and the listening socket opened before the
+# workers are forked, so every worker starts with the same index in shared
+# (copy-on-write) memory and the kernel spreads connections across them.
+# Platforms without fork (Windows) run a single worker.
+def serve(host=HOST, port=PORT, workers=WORKERS, path=MASTER_FILE, prices=PRICE_FILE):
+    get_catalogue(path).records()
+    get_price_history(prices).densities()
+    server = QuoteServer((host, port), path, prices)
+    print(f"Quoting on http://{host}:{server.server_port} with {workers} worker(s), "
+          f"{len(get_catalogue(path))} catalogue entries", file=sys.stderr)
+    if workers <= 1 or not hasattr(os, "fork"):
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        server.server_close()
+        return
+    # Keep the loaded catalogue out of the collector so it isn't copied into every worker
+    gc.freeze()
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                server.serve_forever()
+            finally:
+                os._exit(0)
+        children.append(pid)
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        server.server_close()
+
+
+# One client process: quotes as fast as it can over one keep-alive connection
+def _load_client(args):
+    host, port, specs, batch, seconds = args
+    conn = http.client.HTTPConnection(host, port)
+    headers = {"Content-Type": "application/json"}
+    if batch > 1:
+        bodies = [json.dumps({"quotes": specs[i:i + batch]}).encode()
+                  for i in range(0, len(specs) - batch + 1, batch)]
+    else:
+        bodies = [json.dumps(spec).encode() for spec in specs]
+    path = "/quotes" if batch > 1 else "/quote"
+    quotes = requests = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        conn.request("POST", path, bodies[requests % len(bodies)], headers)
+        response = conn.getresponse()
+        response.read()
+        if response.status != 200:
+            raise RuntimeError(f"{path} returned {response.status}")
+        requests += 1
+        quotes += batch
+    conn.close()
+    return quotes, requests
+
+
+# Quotes/s from `clients` processes hammering a running service
+def load_test(host, port, specs, clients=WORKERS, batch=1, seconds=5.0):
+    with multiprocessing.Pool(clients) as pool:
+        start = time.perf_counter()
+        results = pool.map(_load_client, [(host, port, specs, batch, seconds)] * clients)
+        elapsed = time.perf_counter() - start
+    quotes = sum(q for q, _ in results)
+    requests = sum(r for _, r in results)
+    return quotes / elapsed, requests / elapsed
+
+
+def _wait_until_up(host, port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("quote service did not start")
+
+
+# python quote_api.py [--host H] [--port P] [--workers N] [--master idler_master.xlsx] [--prices material_prices.csv]
+# python quote_api.py --load-test [--workers N] [--clients N] [--seconds S]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP/JSON idler quote service")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--master", default=MASTER_FILE, help="master catalogue workbook")
+    parser.add_argument("--prices", default=PRICE_FILE, help="material price history")
+    parser.add_argument("--load-test", action="store_true",
+                        help="start the service on a synthetic 1,000-entry catalogue and measure quotes/s")
+    parser.add_argument("--clients", type=int, default=WORKERS, help="load-test client processes")
+    parser.add_argument("--seconds", type=float, default=5.0, help="load-test duration per mode")
+    args = parser.parse_args()
+
+    if not args.load_test:
+        serve(args.host, args.port, args.workers, args.master, args.prices)
+        sys.exit(0)
+
+    import tempfile
+
+    import numpy as np
+
+    from benchmark import master_rows, spec_rows
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as workdir:
+        master = master_rows(1_000, rng).rename(columns={"Bearing": "Bearing Cost", "Housing": "Cup Cost"})
+        master["Painting"] = 40.0
+        master_path = os.path.join(workdir, "master.xlsx")
+        master.to_excel(master_path, index=False)
+        # Half the specs are catalogue sizes without their own bought-out costs
+        specs = spec_rows(2_000, rng).to_dict("records")
+        for spec, (_, row) in zip(specs[::2], master.iterrows()):
+            spec.update({"Pipe OD": row["Pipe OD"], "Shaft Dia": row["Shaft Dia"]})
+            spec.pop("Bearing Cost")
+            spec.pop("Cup Cost")
+        server = multiprocessing.Process(target=serve, args=(HOST, args.port, args.workers, master_path,
+                                                             os.path.join(workdir, "prices.csv")))
+        server.start()
+        try:
+            _wait_until_up(HOST, args.port)
+            print(f"{'mode':<18}{'quotes/s':>12}{'requests/s':>12}")
+            single, _ = load_test(HOST, args.port, specs, args.clients, 1, args.seconds)
+            print(f"{'single /quote':<18}{single:>12,.0f}{single:>12,.0f}")
+            for batch in (100, 1_000):
+                quotes, requests = load_test(HOST, args.port, specs, args.clients, batch, args.seconds)
+                print(f"{f'batch /quotes x{batch}':<18}{quotes:>12,.0f}{requests:>12,.1f}")
+        finally:
+            os.kill(server.pid, signal.SIGINT)
+            server.join()
+    print(f"target {LOAD_TEST_TARGET:,} single quotes/s: {'met' if single >= LOAD_TEST_TARGET else 'NOT met'} "
+          f"({os.cpu_count()} CPU(s), {args.workers} worker(s), {args.clients} client(s))")
+    sys.exit(0 if single >= LOAD_TEST_TARGET else 1)
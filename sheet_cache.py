@@ -0,0 +1,148 @@
+import hashlib
+import os
+import tempfile
+import zipfile
+from io import BytesIO
+
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+from profiling import timed
+
+try:
+    import pyarrow as pa
+except ImportError:  # no on-disk cache, tables are kept in memory only
+    pa = None
+
+CACHE_DIR = ".sheet_cache"
+# Cached workbooks kept on disk, least recently used removed first
+MAX_CACHE_FILES = 16
+CHUNK_ROWS = 50_000
+PRICE_COLUMNS = ["size", "length inch", "moq", "final price"]
+
+
+def _clean(name):
+    return str(name).strip().lower() if name is not None else ""
+
+
+# Stream a workbook sheet by sheet in chunks of rows, keeping only the wanted
+# columns (matched on trimmed, lower-cased header). openpyxl's read-only mode
+# parses rows lazily, so only one chunk is held in memory at a time.
+def iter_sheet_chunks(data, columns, chunk_rows=CHUNK_ROWS):
+    try:
+        wb = load_workbook(BytesIO(data), read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException):
+        # Legacy .xls: openpyxl can't stream it, fall back to a full read
+        for sheet, df in pd.read_excel(BytesIO(data), sheet_name=None).items():
+            df.columns = [_clean(name) for name in df.columns]
+            if columns[0] in df.columns:
+                df = df[[name for name in columns if name in df.columns]]
+                for start in range(0, len(df), chunk_rows):
+                    yield sheet, df.iloc[start:start + chunk_rows]
+        return
+    try:
+        for ws in wb.worksheets:
+            rows = ws.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            positions = {_clean(name): i for i, name in enumerate(header)}
+            if columns[0] not in positions:
+                continue
+            wanted = [(name, positions[name]) for name in columns if name in positions]
+            chunk = []
+            for row in rows:
+                chunk.append([row[i] if i < len(row) else None for _, i in wanted])
+                if len(chunk) == chunk_rows:
+                    yield ws.title, pd.DataFrame(chunk, columns=[name for name, _ in wanted])
+                    chunk = []
+            if chunk:
+                yield ws.title, pd.DataFrame(chunk, columns=[name for name, _ in wanted])
+    finally:
+        wb.close()
+
+
+# Header-less two-column sheet (label in column B, value in column C) as a dict
+@timed()
+def read_key_values(source, key_col=1, value_col=2):
+    data = source.getvalue() if hasattr(source, "getvalue") else source
+    wb = load_workbook(BytesIO(data), read_only=True, data_only=True)
+    try:
+        values = {}
+        for row in wb.worksheets[0].iter_rows(values_only=True):
+            if len(row) > max(key_col, value_col) and row[key_col] is not None:
+                values[row[key_col]] = row[value_col]
+        return values
+    finally:
+        wb.close()
+
+
+# Cells are stored as text so every chunk has the same schema; empty cells stay null
+def _as_text(chunk, sheet, columns):
+    out = pd.DataFrame({name: chunk[name] if name in chunk else None for name in columns})
+    out = out.astype(object).where(out.notna(), None)
+    out = out.apply(lambda col: col.map(lambda v: None if v is None else str(v)))
+    out["sheet"] = sheet
+    return out
+
+
+def cache_path(data, columns):
+    key = hashlib.sha1(data + "|".join(columns).encode()).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.arrow")
+
+
+# Drop the least recently used cache files beyond MAX_CACHE_FILES, so
+# superseded uploads don't pile up
+def _trim_cache(keep=MAX_CACHE_FILES):
+    paths = [os.path.join(CACHE_DIR, name) for name in os.listdir(CACHE_DIR) if name.endswith(".arrow")]
+    paths.sort(key=lambda p: os.stat(p).st_mtime, reverse=True)
+    for path in paths[keep:]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+# One stacked table of the wanted columns plus 'sheet'. The first call
+# streams the workbook into an Arrow IPC file; later calls (also after a
+# restart) memory-map that file instead of parsing the workbook again. With
+# pyarrow the result is the memory-mapped Arrow table, not a DataFrame, so
+# cells are only read when used; without it, a DataFrame.
+@timed()
+def load_table(data, columns=PRICE_COLUMNS, chunk_rows=CHUNK_ROWS):
+    columns = list(columns)
+    if pa is None:
+        parts = [_as_text(chunk, sheet, columns) for sheet, chunk in iter_sheet_chunks(data, columns, chunk_rows)]
+        return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=columns + ["sheet"])
+
+    path = cache_path(data, columns)
+    if not os.path.exists(path):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        schema = pa.schema([(name, pa.string()) for name in columns + ["sheet"]])
+        # A file of its own per writer, so threads (or processes) building the
+        # same table at once never write into each other's file
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=CACHE_DIR)
+        os.close(fd)
+        try:
+            with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+                for sheet, chunk in iter_sheet_chunks(data, columns, chunk_rows):
+                    batch = pa.RecordBatch.from_pandas(_as_text(chunk, sheet, columns), schema=schema,
+                                                       preserve_index=False)
+                    writer.write_batch(batch)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        _trim_cache()
+    else:
+        os.utime(path)
+    # The table's buffers keep the mapping alive after the file is closed
+    with pa.memory_map(path, "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def clear_cache():
+    if os.path.isdir(CACHE_DIR):
+        for name in os.listdir(CACHE_DIR):
+            os.remove(os.path.join(CACHE_DIR, name))
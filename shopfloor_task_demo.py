@@ -1,14 +1,23 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
+import debug_panel
+from task_store import STATUSES, create_task, get_board, reassign, seed, set_status, start_scheduler
 
-# Sample data
-if 'tasks' not in st.session_state:
-    st.session_state.tasks = [
-        {"Task": "Check motor alignment", "Assigned To": "Ravi", "Due Time": "11:00 AM", "Status": "To Do"},
-        {"Task": "Clean Tank Filters", "Assigned To": "Mani", "Due Time": "1:00 PM", "Status": "In Progress"},
-        {"Task": "Replace Valve #3", "Assigned To": "Arun", "Due Time": "3:00 PM", "Status": "Done"}
-    ]
+# How often each screen checks the shared board for changes (a version compare, not a redraw)
+REFRESH_SECONDS = 2
+PAGE_SIZE = 25
+
+run = debug_panel.begin("shopfloor_task_demo")
+
+# Sample data for an empty board; every display and tablet shares the same task log
+seed([
+    {"Task": "Check motor alignment", "Assigned To": "Ravi", "Due": datetime.combine(date.today(), time(11)), "Status": "To Do"},
+    {"Task": "Clean Tank Filters", "Assigned To": "Mani", "Due": datetime.combine(date.today(), time(13)), "Status": "In Progress"},
+    {"Task": "Replace Valve #3", "Assigned To": "Arun", "Due": datetime.combine(date.today(), time(15)), "Status": "Done"}
+])
+# Flags tasks overdue the moment they pass their due time (one thread per server)
+start_scheduler()
 
 st.title("🛠️ Shop Floor Task Display")
 
@@ -28,30 +37,105 @@ with st.expander("🔍 Operational Insights"):
 
 # Display tasks
 st.subheader("📋 Today's Tasks")
-for i, task in enumerate(st.session_state.tasks):
-    cols = st.columns([4, 2, 2, 2])
-    cols[0].markdown(f"**{task['Task']}**")
-    cols[1].markdown(f"👤 {task['Assigned To']}")
-    cols[2].markdown(f"⏰ {task['Due Time']}")
-    new_status = cols[3].selectbox("Status", ["To Do", "In Progress", "Done"], index=["To Do", "In Progress", "Done"].index(task['Status']), key=f"status_{i}")
-    st.session_state.tasks[i]['Status'] = new_status
+# Runs on its own every few seconds; the page is redrawn only when the board's
+# version has moved past the one this screen last drew
+@st.fragment(run_every=REFRESH_SECONDS)
+def watch_board():
+    board = get_board()
+    if board.version != st.session_state.board_cursor:
+        # Too far behind for a list of changes: just redraw, without toasts
+        st.session_state.board_changes = board.changes_since(st.session_state.board_cursor) or []
+        st.rerun()
+    st.caption(f"🟢 Live · board version {board.version}")
+
+for task in st.session_state.pop("board_changes", []):
+    flag = " · 🔴 OVERDUE" if task['Overdue'] else ""
+    st.toast(f"🔔 {task['Task']} ({task['Assigned To']}): {task['Status']}{flag}")
+
+# Next due / overdue / due soon come straight off the board's due-time indexes
+board = get_board()
+next_task = board.next_due()
+overdue_ids = board.overdue_now()
+col1, col2, col3 = st.columns(3)
+col1.metric("⏭️ Next Due", next_task['Due'].strftime('%I:%M %p') if next_task else "—",
+            next_task['Task'] if next_task else None, delta_color="off")
+col2.metric("🔴 Overdue Now", len(overdue_ids))
+col3.metric("⏳ Due in Next Hour", len(board.due_within(timedelta(hours=1))))
+if overdue_ids:
+    st.error("🔴 Overdue: " + ", ".join(f"{task['Task']} ({task['Assigned To']})" for task in board.rows(overdue_ids[:5]))
+             + (f" and {len(overdue_ids) - 5} more" if len(overdue_ids) > 5 else ""))
+
+# Filters are answered from the board's indexes; only one page is drawn
+col1, col2, col3, col4, col5 = st.columns([3, 3, 2, 2, 2])
+show_assignees = col1.multiselect("👤 Assigned To", board.assignees())
+show_statuses = col2.multiselect("Status", STATUSES)
+due_from = col3.time_input("⏰ Due From", value=None)
+due_to = col4.time_input("Due To", value=None)
+overdue_only = col5.checkbox("Overdue only")
+task_ids = board.query(show_assignees, show_statuses,
+                       datetime.combine(date.today(), due_from) if due_from else None,
+                       datetime.combine(date.today(), due_to) if due_to else None, overdue_only)
+
+pages = max(1, (len(task_ids) - 1) // PAGE_SIZE + 1)
+page = st.number_input(f"Page (of {pages}, {len(task_ids)} tasks)", min_value=1, max_value=pages, value=1)
+page_ids = task_ids[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+page_tasks = pd.DataFrame(board.rows(page_ids), columns=["ID", "Task", "Assigned To", "Due", "Status", "Overdue"])
+
+# One editor for the whole page; rows are keyed by task ID, not position. The
+# editor only starts afresh when the page or filters change, so unsaved edits
+# survive other screens' updates
+edited = st.data_editor(
+    page_tasks.set_index("ID"),
+    column_config={
+        "Status": st.column_config.SelectboxColumn("Status", options=STATUSES, required=True),
+        "Due": st.column_config.DatetimeColumn("Due", format="D MMM, h:mm a")
+    },
+    disabled=["Task", "Assigned To", "Due", "Overdue"],
+    key=f"tasks_{page}_{show_assignees}_{show_statuses}_{due_from}_{due_to}_{overdue_only}"
+)
+col1, col2, col3 = st.columns([2, 2, 3])
+changed = edited.index[edited["Status"] != page_tasks.set_index("ID")["Status"]]
+if col1.button(f"💾 Save {len(changed)} Changes", disabled=not len(changed)):
+    # Checked against the board as it is now, not as this page was drawn
+    for task in get_board().rows(list(edited.index)):
+        if edited.at[task["ID"], "Status"] != task["Status"]:
+            set_status(task["ID"], edited.at[task["ID"], "Status"])
+    st.rerun()
+bulk_status = col2.selectbox("Set whole page to", STATUSES, label_visibility="collapsed")
+if col3.button(f"✅ Mark {len(page_ids)} tasks on this page as {bulk_status}", disabled=not page_ids):
+    for task_id in page_ids:
+        set_status(task_id, bulk_status)
+    st.rerun()
 
 # Add new task section
 with st.expander("➕ Add New Task"):
     new_task = st.text_input("Task Description")
     assigned_to = st.text_input("Assign To")
-    due_time = st.time_input("Due Time", value=datetime.now().time())
+    col1, col2 = st.columns(2)
+    due_date = col1.date_input("Due Date", value=date.today())
+    due_time = col2.time_input("Due Time", value=datetime.now().time())
     if st.button("Add Task"):
         if new_task and assigned_to:
-            st.session_state.tasks.append({
-                "Task": new_task,
-                "Assigned To": assigned_to,
-                "Due Time": due_time.strftime('%I:%M %p'),
-                "Status": "To Do"
-            })
+            create_task(new_task, assigned_to, datetime.combine(due_date, due_time))
             st.success("✅ Task Added!")
         else:
             st.warning("Please enter both task and assignee.")
 
+# Hand a task on the current page over to someone else
+with st.expander("🔁 Reassign Task"):
+    if page_ids:
+        names = {task["ID"]: task["Task"] for task in page_tasks.to_dict("records")}
+        task_id = st.selectbox("Task", page_ids, format_func=names.get)
+        new_assignee = st.text_input("Reassign To")
+        if st.button("Reassign") and new_assignee:
+            reassign(task_id, new_assignee)
+            st.success(f"✅ Reassigned to {new_assignee}")
+
+# Everything up to here (including this screen's own edits) has been drawn
+st.session_state.board_cursor = get_board().version
+watch_board()
+
 st.markdown("---")
-st.markdown("🔄 This demo resets on refresh. Data can be connected to a real backend (Google Sheets, Firebase, etc.)")
+st.markdown("🔄 Tasks are shared by every screen and kept in `shopfloor_tasks.jsonl` (one line per change).")
+
+debug_panel.show(run)
@@ -1,18 +1,58 @@
 import streamlit as st
 import pandas as pd
 from datetime import date
+from functools import partial
+import debug_panel
+from ledger_store import (add_expenses, add_salaries, count, delete_entry, get_entry, months, query, rollup,
+                          update_entry)
+from estimate_export import XLSX_MIME
+from ledger_report import report_bytes, report_name
+from payroll import compute_payroll, post_payroll
+from profiling import span
+
+PAGE_SIZE = 50
 
 st.set_page_config(page_title="Steadfast Salary App", layout="wide")
+run = debug_panel.begin("steadfast_salaryapp")
 st.title("💼 Steadfast Super Salary & Expense App")
 
-# Initialize session state
-if 'salary_data' not in st.session_state:
-    st.session_state.salary_data = []
-if 'fixed_expenses' not in st.session_state:
-    st.session_state.fixed_expenses = []
+# Entries live in a shared SQLite ledger, so they survive refreshes
+def show_page(table, key, **filters):
+    total = count(table, **filters)
+    if total:
+        pages = (total - 1) // PAGE_SIZE + 1
+        page = st.number_input(f"Page (of {pages}, {total} entries)", min_value=1, max_value=pages, value=1, key=key)
+        st.dataframe(query(table, limit=PAGE_SIZE, offset=(page - 1) * PAGE_SIZE, **filters))
+    return total
+
+# Correct or remove one entry by its ID; summaries update with it
+def edit_entry(table, key, field, label):
+    with st.expander("✏️ Edit / Delete Entry"):
+        col1, col2 = st.columns(2)
+        entry_id = col1.number_input("Entry ID", min_value=1, step=1, key=f"{key}_id")
+        entry = get_entry(table, int(entry_id))
+        if entry is None:
+            st.info("No entry with that ID.")
+            return
+        st.caption(f"{entry['month']} · " + " · ".join(str(v) for k, v in entry.items() if k in ("name", "vendor", "type", "category")))
+        value = col2.number_input(label, value=float(entry[field]), key=f"{key}_{field}")
+        col1, col2 = st.columns(2)
+        if col1.button("💾 Update", key=f"{key}_update"):
+            changes = {field: value}
+            if table == "salaries":
+                changes["net_amount"] = entry["total_amount"] - value
+            update_entry(table, int(entry_id), **changes)
+            st.success(f"Updated entry {entry_id}.")
+        if col2.button("🗑️ Delete", key=f"{key}_delete"):
+            delete_entry(table, int(entry_id))
+            st.success(f"Deleted entry {entry_id}.")
+
+# Month the entries below belong to
+recent_months = pd.period_range(end=date.today(), periods=12, freq="M").strftime("%Y-%m").tolist()
+month = st.selectbox("📅 Month", sorted(set(recent_months) | set(months()), reverse=True))
 
 # Tabs for structure
-tab1, tab2, tab3 = st.tabs(["🧑‍🏭 Salaries", "🏪 Expenses", "📤 Export"])
+tab1, tab2, tab3, tab4 = st.tabs(["🧑‍🏭 Salaries", "🏪 Expenses", "📊 Dashboard", "📤 Export"])
 
 # --- Tab 1: Salary Entry ---
 with tab1:
@@ -34,21 +74,49 @@ with tab1:
         total_days = days_worked + ot_days
         total_amount = per_day * total_days if salary_type == "Daily Wage" else fixed_salary
         net_amount = total_amount - advance
-        st.session_state.salary_data.append({
-            'Name': name,
-            'Type': salary_type,
-            'Per Day': per_day,
-            'Days Worked': days_worked,
-            'OT Hours': ot_hours,
-            'Advance': advance,
-            'Total Amount': total_amount,
-            'Net Amount': net_amount
-        })
+        add_salaries([{
+            'month': month,
+            'name': name,
+            'type': salary_type,
+            'per_day': per_day,
+            'days_worked': days_worked,
+            'ot_hours': ot_hours,
+            'advance': advance,
+            'total_amount': total_amount,
+            'net_amount': net_amount
+        }])
         st.success(f"Added {name}'s salary details.")
 
-    if st.session_state.salary_data:
+    with st.expander("📥 Bulk Payroll from Attendance Register"):
+        st.caption("Columns: Name, Type (Daily Wage / Fixed Salary), Per Day, Fixed Salary, Days Worked, OT Hours, Advance")
+        register_file = st.file_uploader("Upload attendance/OT sheet", type=["xlsx", "csv"])
+        if register_file:
+            with span("read register"):
+                if register_file.name.endswith(".csv"):
+                    register = pd.read_csv(register_file)
+                else:
+                    register = pd.read_excel(register_file)
+            payroll_rows, rejected = compute_payroll(register, month)
+            if not rejected.empty:
+                st.warning(f"{len(rejected)} rows skipped:")
+                st.dataframe(rejected)
+            st.write(f"**{len(payroll_rows)} entries, net payable ₹{round(payroll_rows['net_amount'].sum(), 2)}**")
+            st.dataframe(payroll_rows.head(PAGE_SIZE))
+            # A register is posted to a month once; the button stays off until another file is uploaded
+            posted = st.session_state.setdefault("posted_registers", set())
+            upload = (register_file.file_id, month)
+            if upload in posted:
+                st.info(f"This register has already been added to {month}.")
+            if len(payroll_rows) and st.button(f"➕ Add {len(payroll_rows)} entries to {month}",
+                                               disabled=upload in posted):
+                post_payroll(payroll_rows)
+                posted.add(upload)
+                st.success(f"Added {len(payroll_rows)} salary entries.")
+
+    if count("salaries", month=month):
         st.markdown("### 👥 Salary Summary")
-        st.dataframe(pd.DataFrame(st.session_state.salary_data))
+        show_page("salaries", "salary_page", month=month)
+        edit_entry("salaries", "salary_edit", "advance", "Advance Paid")
 
 # --- Tab 2: Fixed Expenses Entry ---
 with tab2:
@@ -64,29 +132,51 @@ with tab2:
         expense_date = st.date_input("Date", value=date.today())
 
     if st.button("➕ Add Expense Entry"):
-        st.session_state.fixed_expenses.append({
-            'Vendor': vendor,
-            'Category': category,
-            'Amount': amount,
-            'Date': expense_date,
-            'Remarks': remarks
-        })
+        add_expenses([{
+            'month': expense_date.strftime("%Y-%m"),
+            'vendor': vendor,
+            'category': category,
+            'amount': amount,
+            'date': expense_date.isoformat(),
+            'remarks': remarks
+        }])
         st.success(f"Added expense for {vendor}.")
 
-    if st.session_state.fixed_expenses:
+    if count("expenses", month=month):
         st.markdown("### 🧾 Expense Summary")
-        st.dataframe(pd.DataFrame(st.session_state.fixed_expenses))
+        show_page("expenses", "expense_page", month=month)
+        edit_entry("expenses", "expense_edit", "amount", "Amount")
 
-# --- Tab 3: Export Data ---
+# --- Tab 3: Dashboard (pre-aggregated monthly totals) ---
 with tab3:
+    salary_totals = rollup("salaries", month=month)
+    expense_totals = rollup("expenses", month=month)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Salaries Payable", f"₹{salary_totals['Net Amount'].sum():,.2f}")
+    col2.metric("Advances", f"₹{salary_totals['Advance'].sum():,.2f}")
+    col3.metric("Expenses", f"₹{expense_totals['Amount'].sum():,.2f}")
+    col4.metric("Total Outflow", f"₹{salary_totals['Net Amount'].sum() + expense_totals['Amount'].sum():,.2f}")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("### 👥 Per Employee")
+        st.dataframe(salary_totals.drop(columns="Month"))
+    with col2:
+        st.markdown("### 🏪 Per Category")
+        st.dataframe(expense_totals.drop(columns="Month"))
+        if not expense_totals.empty:
+            st.bar_chart(expense_totals.set_index("Category")["Amount"])
+
+# --- Tab 4: Export Data ---
+with tab4:
     st.subheader("📤 Export Monthly Report")
-    if st.button("📥 Download Excel Report"):
-        salary_df = pd.DataFrame(st.session_state.salary_data)
-        expense_df = pd.DataFrame(st.session_state.fixed_expenses)
+    # Built in memory on click and reused until that month's entries change
+    st.download_button("📥 Download Excel Report", data=partial(report_bytes, month),
+                       file_name=report_name(month), mime=XLSX_MIME)
 
-        with pd.ExcelWriter("Steadfast_Monthly_Report.xlsx") as writer:
-            salary_df.to_excel(writer, sheet_name='Salaries', index=False)
-            expense_df.to_excel(writer, sheet_name='Expenses', index=False)
+    st.markdown("### 🗂️ Multi-Month Export")
+    export_months = st.multiselect("Months", months())
+    if export_months:
+        st.download_button(f"📥 Download {len(export_months)} Months", data=partial(report_bytes, sorted(export_months)),
+                           file_name=report_name(export_months), mime=XLSX_MIME)
 
-        with open("Steadfast_Monthly_Report.xlsx", "rb") as f:
-            st.download_button("📥 Click to Download", f, file_name="Steadfast_Monthly_Report.xlsx")
+debug_panel.show(run)
@@ -0,0 +1,42 @@
+import streamlit as st
+
+# All apps in one Streamlit process: `streamlit run streamlit_app.py`.
+# A page's script, and the libraries it imports (pandas, openpyxl, requests,
+# jwt...), is only loaded the first time someone opens that page. Module-level
+# caches - master catalogue, price indexes, task board, ledger connections,
+# Zoom client - are built once and shared by every page and session.
+PAGES = {
+    "Steadfast": [
+        ("SFNew_IdlerEst.py", "Idler Estimator", "🔩"),
+        ("Idler_Estimate.py", "Idler Estimate (Detailed)", "🧮"),
+        ("steadfast_salaryapp.py", "Salary & Expenses", "💼"),
+        ("shopfloor_task_demo.py", "Shop Floor Tasks", "🛠️")
+    ],
+    "Fits Engineering": [
+        ("Fits_8M_NUT_price.py", "Price Extractor", "📦")
+    ],
+    "Miracle Morning": [
+        ("MMzoomlinkcreate_hybrid.py", "Zoom Link Generator", "🌄")
+    ],
+    "Utilities": [
+        ("shoppingbillapp.py", "Shopping Bill", "🛒"),
+        ("number_comparison.py", "Number Comparison", "🔢"),
+        ("st_test.py", "Hello", "👋")
+    ]
+}
+
+
+# Landing page: imports nothing beyond streamlit, so the process starts light
+def home():
+    st.title("🏭 Streamlit Projects")
+    st.write("Pick an app from the sidebar. Each one loads the first time it is opened.")
+    for section, pages in PAGES.items():
+        st.markdown(f"**{section}**")
+        for script, title, icon in pages:
+            st.page_link(script, label=title, icon=icon)
+
+
+navigation = {"": [st.Page(home, title="Home", icon="🏠", default=True)]}
+for section, pages in PAGES.items():
+    navigation[section] = [st.Page(script, title=title, icon=icon) for script, title, icon in pages]
+st.navigation(navigation).run()
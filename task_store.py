@@ -0,0 +1,372 @@
+import bisect
+import heapq
+import json
+import math
+import os
+import threading
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+
+from profiling import span
+
+TASK_LOG = "shopfloor_tasks.jsonl"
+STATUSES = ["To Do", "In Progress", "Done"]
+OPEN_STATUSES = ["To Do", "In Progress"]
+# Due times written before they were stored as timestamps ("11:00 AM")
+LEGACY_DUE_FORMAT = "%I:%M %p"
+# Longest the overdue scheduler sleeps, so tasks added by other processes are noticed
+POLL_SECONDS = 30
+# Changes remembered for screens catching up; one further behind redraws in full
+MAX_CHANGES = 1_000
+
+_boards = {}
+_boards_lock = threading.RLock()
+_schedulers = {}
+
+
+# Current state of every task, folded from the event log. Each event is
+# applied in O(1). A client keeps the version it last drew (its cursor) and
+# asks only for what changed since.
+#
+# Tasks are also indexed by assignee, by status and by due time (a sorted
+# list), so a filtered page is found without looking at every task. Open
+# tasks not yet due sit in a min-heap on due time: the next one to come due
+# is always on top, and flagging overdue work only pops what has passed.
+#
+# One board is shared by every session and the scheduler thread, and events
+# are applied under _boards_lock; the read methods below take that lock too
+# and hand back copies, so a page never walks an index while it changes.
+class TaskBoard:
+    def __init__(self):
+        self.tasks = {}
+        self.version = 0
+        self.offset = 0
+        self.changed = deque(maxlen=MAX_CHANGES)
+        self.by_assignee = {}
+        self.by_status = {name: set() for name in STATUSES}
+        self.by_due = []
+        self.due_heap = []
+        self.overdue = set()
+        self.order = {}
+
+    def _move(self, index, task_id, old, new):
+        if old is not None:
+            index[old].discard(task_id)
+            if not index[old] and index is self.by_assignee:
+                del index[old]
+        index.setdefault(new, set()).add(task_id)
+
+    def _due_key(self, task_id):
+        return _timestamp(self.tasks[task_id]["Due"]), self.order[task_id], task_id
+
+    def _changed(self, task_id):
+        self.changed.append(task_id)
+        self.version += 1
+
+    def apply(self, event):
+        kind, task_id = event["event"], event["id"]
+        if kind == "created":
+            task = self.tasks[task_id] = {
+                "ID": task_id,
+                "Task": event["task"],
+                "Assigned To": event["assigned_to"],
+                "Due": parse_due(event["due"], event["at"]),
+                "Status": event.get("status", STATUSES[0]),
+                "Overdue": False,
+                "Updated": event["at"]
+            }
+            self.order[task_id] = len(self.order)
+            self._move(self.by_assignee, task_id, None, task["Assigned To"])
+            self._move(self.by_status, task_id, None, task["Status"])
+            bisect.insort(self.by_due, self._due_key(task_id))
+            heapq.heappush(self.due_heap, self._due_key(task_id))
+        elif task_id in self.tasks:
+            task = self.tasks[task_id]
+            if kind == "status":
+                self._move(self.by_status, task_id, task["Status"], event["status"])
+                if event["status"] not in OPEN_STATUSES:
+                    self.overdue.discard(task_id)
+                    task["Overdue"] = False
+                elif task["Status"] not in OPEN_STATUSES:
+                    # Reopened: back in the queue, flagged again once due
+                    heapq.heappush(self.due_heap, self._due_key(task_id))
+                task["Status"] = event["status"]
+            elif kind == "reassigned":
+                self._move(self.by_assignee, task_id, task["Assigned To"], event["assigned_to"])
+                task["Assigned To"] = event["assigned_to"]
+            task["Updated"] = event["at"]
+        self._changed(task_id)
+
+    # Flag open tasks whose due time has passed. Returns seconds until the
+    # next open task comes due, or None when nothing is waiting. Only the
+    # scheduler thread calls this (under _boards_lock); readers just look.
+    def flag_overdue(self, now=None):
+        now = _timestamp(now or datetime.now())
+        heap = self.due_heap
+        while heap:
+            due, _, task_id = heap[0]
+            task = self.tasks[task_id]
+            if task["Status"] not in OPEN_STATUSES or task_id in self.overdue or due == math.inf:
+                heapq.heappop(heap)
+            elif due <= now:
+                heapq.heappop(heap)
+                self.overdue.add(task_id)
+                task["Overdue"] = True
+                self._changed(task_id)
+            else:
+                return due - now
+        return None
+
+    # Open task due soonest after now, None when there is none
+    def next_due(self, now=None):
+        now = _timestamp(now or datetime.now())
+        with _boards_lock:
+            position = bisect.bisect_right(self.by_due, (now, math.inf))
+            while position < len(self.by_due):
+                due, _, task_id = self.by_due[position]
+                if due == math.inf:
+                    break
+                if self.tasks[task_id]["Status"] in OPEN_STATUSES and task_id not in self.overdue:
+                    return dict(self.tasks[task_id])
+                position += 1
+            return None
+
+    # Tasks the scheduler has flagged overdue, by due time
+    def overdue_now(self):
+        with _boards_lock:
+            return sorted(self.overdue, key=self._due_key)
+
+    # Open tasks falling due between now and now + window
+    def due_within(self, window=timedelta(hours=1), now=None):
+        now = now or datetime.now()
+        return self.query(statuses=OPEN_STATUSES, due_from=now, due_to=now + window)
+
+    # Ids matching every given filter, ordered by due time. assignees and
+    # statuses are lists (empty/None means any); due_from/due_to are datetimes.
+    def query(self, assignees=None, statuses=None, due_from=None, due_to=None, overdue_only=False):
+        with _boards_lock:
+            return self._query(assignees, statuses, due_from, due_to, overdue_only)
+
+    def _query(self, assignees, statuses, due_from, due_to, overdue_only):
+        sets = []
+        if assignees:
+            sets.append(set().union(*(self.by_assignee.get(name, ()) for name in assignees)))
+        if statuses:
+            sets.append(set().union(*(self.by_status.get(name, ()) for name in statuses)))
+        if overdue_only:
+            sets.append(set(self.overdue))
+        low = bisect.bisect_left(self.by_due, (_timestamp(due_from),)) if due_from else 0
+        high = bisect.bisect_right(self.by_due, (_timestamp(due_to), math.inf)) if due_to else len(self.by_due)
+        if not sets:
+            return [entry[2] for entry in self.by_due[low:high]]
+        sets.sort(key=len)
+        wanted = sets[0].intersection(*sets[1:])
+        # Walk whichever is smaller: the matching ids or the due window
+        if len(wanted) < high - low:
+            first = self.by_due[low] if low < len(self.by_due) else (math.inf, math.inf)
+            last = self.by_due[high - 1] if high else (-math.inf,)
+            return [key[2] for key in sorted(map(self._due_key, wanted)) if first <= key <= last]
+        return [entry[2] for entry in self.by_due[low:high] if entry[2] in wanted]
+
+    def rows(self, task_ids):
+        with _boards_lock:
+            return [dict(self.tasks[task_id]) for task_id in task_ids]
+
+    def assignees(self):
+        with _boards_lock:
+            return sorted(self.by_assignee)
+
+    # Tasks touched by events after the cursor, each once, in their current
+    # state. None when the cursor is older than the changes still kept.
+    def changes_since(self, cursor):
+        with _boards_lock:
+            # changed[i] moved the board to version first + i
+            first = self.version - len(self.changed) + 1
+            if cursor + 1 < first:
+                return None
+            recent = list(self.changed)[cursor + 1 - first:]
+            return [dict(self.tasks[task_id]) for task_id in dict.fromkeys(recent) if task_id in self.tasks]
+
+    def __len__(self):
+        return len(self.tasks)
+
+
+# ISO timestamp; a bare "11:00 AM" from older logs is taken as that time on
+# the day the task was created. Unreadable times come back as None.
+def parse_due(value, created_at=None):
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        due = datetime.strptime(value.strip(), LEGACY_DUE_FORMAT).time()
+    except (AttributeError, ValueError):
+        return None
+    day = datetime.fromisoformat(created_at).date() if created_at else datetime.now().date()
+    return datetime.combine(day, due)
+
+# Tasks without a due time sort last and never fall overdue
+def _timestamp(value):
+    return value.timestamp() if value is not None else math.inf
+
+
+def _read_events(path, offset):
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return [], offset
+    # Ignore a half-written last line, it is picked up on the next read
+    end = data.rfind(b"\n") + 1
+    events = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+    return events, offset + end
+
+
+def _log_size(path):
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+# Shared by every session; events other processes appended since the last
+# call are read from the saved offset, the log is never replayed in full twice.
+# With nothing new this is a single stat(), whatever the number of tasks.
+def get_board(path=TASK_LOG):
+    with _boards_lock:
+        board = _boards.get(path)
+        if board is None:
+            board = _boards[path] = TaskBoard()
+        if _log_size(path) == board.offset:
+            return board
+        with span("replay task log"):
+            events, board.offset = _read_events(path, board.offset)
+            for event in events:
+                board.apply(event)
+        return board
+
+
+def _append(event, path):
+    event["at"] = datetime.now().isoformat(timespec="seconds")
+    with _boards_lock:
+        # One write per event; O_APPEND keeps lines from different processes whole
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(event) + "\n")
+        board = get_board(path)
+        if path in _schedulers:
+            _schedulers[path].set()
+        return board
+
+
+# due is a datetime (or an ISO string)
+def create_task(task, assigned_to, due, path=TASK_LOG):
+    task_id = uuid.uuid4().hex[:8]
+    due = due.isoformat(timespec="minutes") if isinstance(due, datetime) else due
+    _append({"event": "created", "id": task_id, "task": task, "assigned_to": assigned_to, "due": due}, path)
+    return task_id
+
+def set_status(task_id, status, path=TASK_LOG):
+    with _boards_lock:
+        board = get_board(path)
+        if status not in STATUSES or task_id not in board.tasks or board.tasks[task_id]["Status"] == status:
+            return False
+        _append({"event": "status", "id": task_id, "status": status}, path)
+        return True
+
+def reassign(task_id, assigned_to, path=TASK_LOG):
+    with _boards_lock:
+        board = get_board(path)
+        if task_id not in board.tasks or board.tasks[task_id]["Assigned To"] == assigned_to:
+            return False
+        _append({"event": "reassigned", "id": task_id, "assigned_to": assigned_to}, path)
+        return True
+
+
+def _run_scheduler(path, wake):
+    while True:
+        with _boards_lock:
+            wait = get_board(path).flag_overdue()
+        wake.wait(POLL_SECONDS if wait is None else min(wait, POLL_SECONDS))
+        wake.clear()
+
+
+# One background thread per log. It sleeps until the next open task comes due
+# (or a new event arrives) and flags it overdue then, which moves the board's
+# version so every screen redraws.
+def start_scheduler(path=TASK_LOG):
+    with _boards_lock:
+        if path not in _schedulers:
+            _schedulers[path] = threading.Event()
+            threading.Thread(target=_run_scheduler, args=(path, _schedulers[path]), daemon=True,
+                             name=f"overdue-{path}").start()
+        return _schedulers[path]
+
+
+# Starting tasks for an empty board (first run of the display)
+def seed(tasks, path=TASK_LOG):
+    with _boards_lock:
+        if len(get_board(path)):
+            return False
+        for task in tasks:
+            task_id = create_task(task["Task"], task["Assigned To"], task["Due"], path)
+            if task.get("Status", STATUSES[0]) != STATUSES[0]:
+                set_status(task_id, task["Status"], path)
+        return True
+
+
+# Brute-force check: 3,000 tasks with random status changes, reassignments
+# and due times (some blank), replayed from a temp log. After each step the
+# indexes (query, overdue flags, next_due) must agree with a plain scan.
+if __name__ == "__main__":
+    import random
+    import sys
+    import tempfile
+    from itertools import product
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 3_000
+    rng = random.Random(0)
+    names = [f"Worker {i}" for i in range(40)]
+    start = datetime(2026, 1, 5, 8, 0)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tasks.jsonl")
+        ids = [create_task(f"Task {i}", rng.choice(names),
+                           None if rng.random() < 0.05 else start + timedelta(minutes=rng.randrange(600)), path)
+               for i in range(n)]
+        board = get_board(path)
+        checks = 0
+        for step in range(20):
+            for task_id in rng.sample(ids, n // 10):
+                if rng.random() < 0.7:
+                    set_status(task_id, rng.choice(STATUSES), path)
+                else:
+                    reassign(task_id, rng.choice(names), path)
+            now = start + timedelta(minutes=30 * step)
+            wait = board.flag_overdue(now)
+
+            def due_order(task):
+                return _timestamp(task["Due"]), board.order[task["ID"]]
+
+            tasks = sorted(board.tasks.values(), key=due_order)
+            waiting = [task for task in tasks if task["Status"] in OPEN_STATUSES and task["Due"]
+                       and task["Due"] > now]
+            assert {task["ID"] for task in tasks if task["Overdue"]} == set(board.overdue) == {
+                task["ID"] for task in tasks if task["Status"] in OPEN_STATUSES and task["Due"] and task["Due"] <= now}
+            assert wait == ((waiting[0]["Due"] - now).total_seconds() if waiting else None)
+            assert (board.next_due(now) or {}).get("ID") == (waiting[0]["ID"] if waiting else None)
+
+            windows = [(None, None), (now, None), (None, now), (now - timedelta(hours=1), now + timedelta(hours=1))]
+            for assignees, statuses, (due_from, due_to), overdue_only in product(
+                    [None, rng.sample(names, 1), rng.sample(names, 5)], [None, ["Done"], OPEN_STATUSES],
+                    windows, [False, True]):
+                expected = [task["ID"] for task in tasks
+                            if (not assignees or task["Assigned To"] in assignees)
+                            and (not statuses or task["Status"] in statuses)
+                            and (not overdue_only or task["Overdue"])
+                            and (due_from is None or _timestamp(task["Due"]) >= _timestamp(due_from))
+                            and (due_to is None or _timestamp(task["Due"]) <= _timestamp(due_to))]
+                assert board.query(assignees, statuses, due_from, due_to, overdue_only) == expected, \
+                    (assignees, statuses, due_from, due_to, overdue_only)
+                checks += 1
+    print(f"{n} tasks, 20 steps: {checks} queries, overdue flags and next due match a full scan")
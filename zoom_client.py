@@ -0,0 +1,188 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from profiling import timed
+
+ZOOM_API = "https://api.zoom.us/v2"
+TOKEN_MINUTES = 5
+# A token this close to expiry is replaced before it is sent
+TOKEN_MARGIN_SECONDS = 30
+MAX_WORKERS = 4
+MAX_RETRIES = 5
+BACKOFF_SECONDS = 1.0
+# Creating a meeting isn't idempotent: a 5xx or a read timeout may come after
+# Zoom made the meeting, so only a rate limit (nothing done) is retried
+RETRY_STATUSES = {429}
+
+
+# Miracle Morning meeting with the fixed passcode
+def meeting_details(start_time, topic="Miracle Morning Meeting", duration=90, password="1234"):
+    return {
+        "topic": topic,
+        "type": 2,
+        "start_time": start_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "duration": duration,
+        "password": password,
+        "settings": {
+            "join_before_host": True,
+            "mute_upon_entry": True
+        }
+    }
+
+
+# True when the request failed before it reached Zoom (no connection made)
+def _not_sent(error):
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(error, requests.ConnectTimeout) or isinstance(reason, NewConnectionError)
+
+
+# One keep-alive connection pool and one JWT shared by every request. The
+# token is minted again only when it is about to expire; rate-limited
+# requests and ones that never got through are retried with exponential
+# backoff (Retry-After wins).
+class ZoomClient:
+    def __init__(self, api_key, api_secret, user_id, base_url=ZOOM_API, workers=MAX_WORKERS,
+                 max_retries=MAX_RETRIES, backoff=BACKOFF_SECONDS):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.user_id = user_id
+        self.base_url = base_url.rstrip("/")
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.tokens_issued = 0
+        self._token = None
+        self._expires = None
+        self._lock = threading.Lock()
+
+    def token(self, force=False):
+        with self._lock:
+            now = datetime.now(timezone.utc)
+            if force or self._expires is None or now >= self._expires - timedelta(seconds=TOKEN_MARGIN_SECONDS):
+                self._expires = now + timedelta(minutes=TOKEN_MINUTES)
+                self._token = jwt.encode({"iss": self.api_key, "exp": self._expires}, self.api_secret,
+                                         algorithm="HS256")
+                self.tokens_issued += 1
+            return self._token
+
+    def _wait(self, response, attempt):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        try:
+            delay = float(retry_after)
+        except (TypeError, ValueError):
+            delay = self.backoff * 2 ** attempt
+        # Jitter so parallel workers don't all come back at the same moment
+        time.sleep(delay * random.uniform(1, 1.25))
+
+    # Meeting JSON, or None once retries are used up / on a non-retryable error
+    @timed("create zoom meeting")
+    def create_meeting(self, start_time, **details):
+        url = f"{self.base_url}/users/{self.user_id}/meetings"
+        body = meeting_details(start_time, **details)
+        refreshed = False
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                response = self.session.post(url, json=body, timeout=30,
+                                             headers={"authorization": f"Bearer {self.token()}"})
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if not _not_sent(e):
+                    return None
+            else:
+                if response.status_code == 201:
+                    return response.json()
+                if response.status_code == 401 and not refreshed:
+                    # Token rejected (clock skew, revoked): mint a new one once
+                    self.token(force=True)
+                    refreshed = True
+                    continue
+                if response.status_code not in RETRY_STATUSES:
+                    return None
+            if attempt < self.max_retries:
+                self._wait(response, attempt)
+        return None
+
+    # Meetings for many start times at once, results in the same order
+    @timed("create zoom meetings")
+    def create_meetings(self, start_times, **details):
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(lambda start: self.create_meeting(start, **details), start_times))
+
+    def close(self):
+        self.session.close()
+
+
+# Daily start times from first_day to last_day inclusive
+def daily_starts(first_day, last_day, start="04:30"):
+    at = datetime.strptime(start, "%H:%M").time()
+    return [datetime.combine(first_day + timedelta(days=i), at) for i in range((last_day - first_day).days + 1)]
+
+
+# python zoom_client.py [days]: batch run against a local mock API that rate-limits
+if __name__ == "__main__":
+    import json
+    import sys
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    secret = "mock-api-secret-for-local-testing"
+    calls = {"total": 0, "limited": 0}
+    connections = set()
+    calls_lock = threading.Lock()
+
+    class MockZoom(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            jwt.decode(self.headers["authorization"].split()[1], secret, algorithms=["HS256"])
+            with calls_lock:
+                connections.add(self.client_address)
+                calls["total"] += 1
+                number = calls["total"]
+                calls["limited"] += number % 5 == 0
+            time.sleep(0.05)
+            # Every fifth call is rate-limited
+            if number % 5 == 0:
+                self._reply(429, {"message": "Too many requests"}, {"Retry-After": "0.1"})
+            else:
+                self._reply(201, {"id": number, "join_url": f"https://zoom.us/j/{number}",
+                                  "start_time": body["start_time"]})
+
+        def _reply(self, status, payload, headers=()):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            for name, value in dict(headers).items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockZoom)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = ZoomClient("key", secret, "me", base_url=f"http://127.0.0.1:{server.server_port}", backoff=0.1)
+    start = time.perf_counter()
+    first = datetime.now().date()
+    meetings = client.create_meetings(daily_starts(first, first + timedelta(days=days - 1)))
+    elapsed = time.perf_counter() - start
+    print(f"{sum(m is not None for m in meetings)}/{days} meetings in {elapsed:.2f}s, "
+          f"{calls['limited']} rate-limited responses retried, {len(connections)} connection(s), "
+          f"{client.tokens_issued} token(s) minted")
+    client.close()
+    server.shutdown()